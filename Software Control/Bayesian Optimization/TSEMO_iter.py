@@ -1,11 +1,127 @@
-# Import summit
-from summit.strategies import TSEMO
-import constraints_edu_new as constraints
+import json
+import importlib
+
+# summit (and with it torch / botorch) is only imported when a strategy is needed,
+# so tools that just read results or check a domain start quickly
+
+# TSEMO strategies built so far, keyed by domain and settings
+_strategies = {}
+
+def strategy_key(domain, n_spectral_points = 4000):
+    return (json.dumps(domain.to_dict(), sort_keys = True, default = str), n_spectral_points)
+
+def get_strategy(domain, n_spectral_points = 4000):
+    #Builds the summit TSEMO strategy on first use and returns the cached one afterwards
+    key = strategy_key(domain, n_spectral_points)
+    if key not in _strategies:
+        from summit.strategies import TSEMO
+        _strategies[key] = TSEMO(domain, n_spectral_points = n_spectral_points)
+    return _strategies[key]
+
+# settings only the incremental engine (tsemo_engine.py) uses, with the values that leave them off
+ENGINE_SETTINGS = {'refit_every': 5, 'speculative': None, 'workers': None, 'executor': 'thread', 'islands': 1,
+                   'cost_model': None, 'feasibility': None, 'prior': None, 'surrogate': 'exact', 'n_inducing': 256}
+
+def check_settings(incremental = False, **settings):
+    #Raises ValueError for engine settings given without incremental, summit's TSEMO would silently ignore them
+    if incremental:
+        return
+    # None by identity, the prior is a DataFrame
+    ignored = [name for name, off in ENGINE_SETTINGS.items()
+               if name in settings and (settings[name] is not None if off is None else settings[name] != off)]
+    if ignored:
+        raise ValueError(f"only the incremental engine uses {', '.join(ignored)}, set incremental = True or leave them off")
+
+def _dataset(frame):
+    from summit import DataSet
+    return DataSet.from_df(frame)
 
 class TSEMO_iteration:
-    con = constraints.constraints()
-    strategy = TSEMO(con.getDomain(), n_spectral_points = 4000)
-    
-    def suggest_next(self, previous):
-        next_experiment = TSEMO_iteration.strategy.suggest_experiments(1,prev_res=previous)
-        return next_experiment
\ No newline at end of file
+
+    def __init__(self, con = None, incremental = False, refit_every = 5, speculative = None, n_spectral_points = 4000,
+                 workers = None, executor = 'thread', islands = 1, cost_model = None,
+                 feasibility = None, prior = None, prior_noise = 4.0, surrogate = 'exact', n_inducing = 256):
+        #con is the constraints object of the campaign (constraints_edu_new if not given)
+        #incremental = True keeps the GP models between iterations (warm started / rank-one updates)
+        #and only refits the hyperparameters from scratch every refit_every iterations
+        #speculative = 'process' or 'thread' precomputes the next suggestion while an experiment runs (needs incremental)
+        #workers / executor / islands run the objectives and NSGA-II islands of the incremental engine on a pool
+        #cost_model (CostModel) selects by hypervolume improvement per hour of rig time (needs incremental)
+        #feasibility (FeasibilityModel) keeps candidates that are likely to fail away from the rig (needs incremental)
+        #prior (DataFrame, prior_campaigns.load_campaigns) warm starts the GPs with results of earlier campaigns,
+        #their noise is prior_noise times that of the campaign's own results (needs incremental)
+        #surrogate = 'sparse' uses inducing point GPs (n_inducing points) for histories of thousands of results (needs incremental)
+        #settings of the incremental engine that differ from their defaults without incremental raise ValueError
+        check_settings(incremental, refit_every = refit_every, speculative = speculative, workers = workers, executor = executor,
+                       islands = islands, cost_model = cost_model, feasibility = feasibility, prior = prior,
+                       surrogate = surrogate, n_inducing = n_inducing)
+        self.con = importlib.import_module('constraints_edu_new').constraints() if con is None else con
+        self.n_spectral_points = n_spectral_points
+        self.engine = None
+        self.speculator = None
+        self.predictor = None
+        if incremental:
+            from tsemo_engine import TSEMOEngine
+            self.engine = TSEMOEngine(self.con.getDomain(), n_spectral_points = n_spectral_points, refit_every = refit_every,
+                                      workers = workers, executor = executor, islands = islands, cost_model = cost_model,
+                                      feasibility = feasibility, surrogate = surrogate, n_inducing = n_inducing)
+            self.engine.add_prior(prior, prior_noise)
+            if speculative is not None:
+                from speculative import SpeculativeSuggester
+                self.speculator = SpeculativeSuggester(self.engine, strategy = 'believer', executor = speculative)
+
+    @property
+    def strategy(self):
+        return get_strategy(self.con.getDomain(), self.n_spectral_points)
+
+    def state_dict(self):
+        #State of the optimizer for a checkpoint (engine state, or the summit strategy with its experiments)
+        if self.engine is not None:
+            return {'engine': self.engine.state_dict()}
+        return {'strategy': self.strategy.to_dict()}
+
+    def load_state_dict(self, state):
+        if self.speculator is not None:
+            self.speculator.cancel()
+        if ('engine' in state) != (self.engine is not None):
+            raise ValueError("checkpoint and optimizer differ in the incremental setting")
+        if 'engine' in state:
+            self.engine.load_state_dict(state['engine'])
+        else:
+            from summit.strategies import TSEMO
+            _strategies[strategy_key(self.con.getDomain(), self.n_spectral_points)] = TSEMO.from_dict(state['strategy'])
+
+    def speculate(self, pending, num_experiments = 1):
+        #Starts computing the suggestion that follows the pending experiment (inputs in domain order)
+        if self.speculator is not None:
+            self.speculator.start(pending, num_experiments)
+
+    def predict(self, X, chunk_size = 4096):
+        '''
+        Posterior means and variances of the objectives, e.g. for response maps over a grid.
+
+        :param X: (N x d) array of inputs in domain order and original units
+        :param chunk_size: rows evaluated at once, bounds the memory for grids of hundreds of thousands of points
+        :return: (means, variances), two (N x number of objectives) arrays in the units of the objectives
+        '''
+        if self.engine is not None:
+            return self.engine.predict(X, chunk_size)
+        # the summit strategy keeps no posterior, its experiments are fitted once per new result
+        experiments = self.strategy.all_experiments
+        if experiments is None or len(experiments) == 0:
+            raise ValueError("no results to predict from yet")
+        if self.predictor is None or self.predictor.X.shape[0] != len(experiments):
+            from tsemo_engine import TSEMOEngine
+            self.predictor = TSEMOEngine(self.con.getDomain())
+            self.predictor.observe(experiments)
+        return self.predictor.predict(X, chunk_size)
+
+    def suggest_next(self, previous, num_experiments = 1):
+        #num_experiments > 1 returns a batch of diverse candidates (sequential max hypervolume improvement) from one fit
+        if self.speculator is not None and self.speculator.pending:
+            return _dataset(self.speculator.resolve(previous, num_experiments))
+        if self.engine is not None:
+            self.engine.observe(previous)
+            return _dataset(self.engine.suggest(num_experiments))
+        next_experiment = self.strategy.suggest_experiments(num_experiments,prev_res=previous)
+        return next_experiment
@@ -0,0 +1,215 @@
+'''
+Suggestion latency benchmark of the optimizer.
+
+Generates synthetic histories on the constraints domain and times, for every combination of
+history size, number of spectral points and number of objectives, the optimizer paths:
+    summit       TSEMO_iteration(incremental = False).suggest_next, summit's TSEMO as in the rig scripts
+    incremental  TSEMO_iteration(incremental = True).suggest_next, the in-repo engine (tsemo_engine.py)
+    stages       the stages of one engine suggestion separately (GP fit from scratch, incremental fit
+                 after one new point, spectral sampling, NSGA-II, hypervolume selection)
+suggest_next is called with the history (suggest_first) and then with one new result (suggest_next,
+the latency of an iteration on the rig). Runs offline on CPU.
+
+    python benchmark_suggest.py --history 10 50 200 --spectral 1500 4000 --objectives 1 2 --output bench.json
+    python benchmark_suggest.py --paths stages --history 50 200    # where the time of the engine goes
+    python benchmark_suggest.py --baseline bench.json     # exit code 1 if a setting got slower than --tolerance
+    python benchmark_suggest.py --objectives 2 3 --workers 4 --islands 4   # objectives and NSGA-II islands on a pool
+    python benchmark_suggest.py --history 1000 5000 10000 --surrogate sparse --repeats 1   # merged multi-campaign histories
+'''
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy as np
+import pandas as pd
+import summit.domain as domain
+import constraints as constraints
+import TSEMO_iter as TSEMO_iter
+from summit import DataSet
+from tsemo_engine import TSEMOEngine
+
+STAGES = ['fit_full', 'fit_incremental', 'sample', 'nsga2', 'select']
+SUGGEST_STAGES = ['suggest_first', 'suggest_next']
+PATHS = ['summit', 'incremental', 'stages']
+
+
+class BenchmarkConstraints:
+    #constraints object (as constraints.constraints) of a benchmark domain, for TSEMO_iteration
+    def __init__(self, dom):
+        self.dom = dom
+
+    def getDomain(self):
+        return self.dom
+
+    def getCols(self):
+        return [v.name for v in self.dom.variables]
+
+
+def benchmark_domain(n_objectives):
+    #constraints domain with its objective plus n_objectives - 1 synthetic ones
+    variables = [v for v in constraints.constraints().getDomain().variables]
+    for k in range(1, n_objectives):
+        variables.append(domain.ContinuousVariable(f"objective_{k}", f"synthetic objective {k}", [-10, 10], is_objective = True, maximize = False))
+    return domain.Domain(variables)
+
+def synthetic_history(dom, n, rng):
+    #uniform samples of the inputs with smooth multimodal objectives
+    bounds = np.array([v.bounds for v in dom.input_variables], dtype = float)
+    U = rng.uniform(size = (n, bounds.shape[0]))
+    history = pd.DataFrame(bounds[:, 0] + U * (bounds[:, 1] - bounds[:, 0]), columns = [v.name for v in dom.input_variables])
+    for k, v in enumerate(dom.output_variables):
+        phase = np.linspace(0, 1, U.shape[1]) + 0.3 * k
+        values = np.sin(3 * U @ np.cos(phase)) + np.sum((U - 0.5 - 0.1 * k)**2, axis = 1)
+        history[v.name] = values + 0.01 * rng.standard_normal(n)
+    return history
+
+def time_stages(dom, n_history, n_spectral_points, generations, pop_size, seed, parallel = None, surrogate = None):
+    rng = np.random.default_rng(seed)
+    history = synthetic_history(dom, n_history + 1, rng)
+    engine = TSEMOEngine(dom, n_spectral_points = n_spectral_points, generations = generations,
+                         pop_size = pop_size, refit_every = 10**9, seed = seed, **(parallel or {}), **(surrogate or {}))
+    timings = {}
+
+    engine.observe(history.iloc[:-1])
+    start = time.perf_counter()
+    engine.fit()
+    timings['fit_full'] = time.perf_counter() - start
+
+    engine.observe(history.iloc[-1:])
+    start = time.perf_counter()
+    engine.fit()
+    timings['fit_incremental'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    samples = engine.sample()
+    timings['sample'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    X, F = engine.optimise(samples)
+    timings['nsga2'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine.select(X, F, 1)
+    timings['select'] = time.perf_counter() - start
+    engine.shutdown()
+    return timings
+
+def time_suggest_next(dom, n_history, n_spectral_points, seed, incremental, parallel = None, surrogate = None):
+    #TSEMO_iteration.suggest_next as the rig scripts call it: with the history, then with one new result
+    rng = np.random.default_rng(seed)
+    np.random.seed(seed)
+    history = synthetic_history(dom, n_history + 1, rng)
+    # a new summit strategy per run, the cached one keeps the experiments of the previous run
+    TSEMO_iter._strategies.clear()
+    engine_kwargs = {**(parallel or {}), **(surrogate or {}), 'refit_every': 10**9} if incremental else {}
+    optimizer = TSEMO_iter.TSEMO_iteration(con = BenchmarkConstraints(dom), incremental = incremental,
+                                           n_spectral_points = n_spectral_points, **engine_kwargs)
+    timings = {}
+
+    start = time.perf_counter()
+    optimizer.suggest_next(DataSet.from_df(history.iloc[:-1]))
+    timings['suggest_first'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    optimizer.suggest_next(DataSet.from_df(history.iloc[-1:]))
+    timings['suggest_next'] = time.perf_counter() - start
+    if optimizer.engine is not None:
+        optimizer.engine.shutdown()
+    return timings
+
+def run(history_sizes, spectral_points, objectives, repeats, generations, pop_size, seed, parallel = None, surrogate = None,
+        paths = ('summit', 'incremental')):
+    results = []
+    kind = (surrogate or {}).get('surrogate', 'exact')
+    for path in paths:
+        for n_objectives in objectives:
+            dom = benchmark_domain(n_objectives)
+            for n_spectral_points in spectral_points:
+                for n_history in history_sizes:
+                    if path == 'stages':
+                        runs = [time_stages(dom, n_history, n_spectral_points, generations, pop_size, seed + r, parallel, surrogate) for r in range(repeats)]
+                        stages = STAGES
+                    else:
+                        runs = [time_suggest_next(dom, n_history, n_spectral_points, seed + r, path == 'incremental', parallel, surrogate) for r in range(repeats)]
+                        stages = SUGGEST_STAGES
+                    entry = {'path': path, 'n_history': n_history, 'n_spectral_points': n_spectral_points, 'n_objectives': n_objectives,
+                             'surrogate': kind if path != 'summit' else 'summit'}
+                    for stage in stages:
+                        entry[stage] = float(np.median([r[stage] for r in runs]))
+                    # latency of an iteration (one new point)
+                    if path == 'stages':
+                        entry['total'] = sum(entry[s] for s in STAGES if s != 'fit_full')
+                    else:
+                        entry['total'] = entry['suggest_next']
+                    results.append(entry)
+                    print(json.dumps(entry), file = sys.stderr)
+    return results
+
+def compare(results, baseline, tolerance):
+    #Returns the settings whose total latency got slower than tolerance x baseline
+    key = lambda e: (e.get('path', 'stages'), e['n_history'], e['n_spectral_points'], e['n_objectives'], e.get('surrogate', 'exact'))
+    reference = {key(e): e for e in baseline['results']}
+    regressions = []
+    for entry in results:
+        old = reference.get(key(entry))
+        if old is not None and entry['total'] > tolerance * old['total']:
+            regressions.append({'setting': key(entry), 'total': entry['total'], 'baseline': old['total']})
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Suggestion latency benchmark')
+    parser.add_argument('--paths', choices = PATHS, nargs = '+', default = ['summit', 'incremental'],
+                        help = 'optimizer paths to time, see the module docstring')
+    parser.add_argument('--history', type = int, nargs = '+', default = [10, 50, 100, 200])
+    parser.add_argument('--spectral', type = int, nargs = '+', default = [1500, 4000])
+    parser.add_argument('--objectives', type = int, nargs = '+', default = [1, 2])
+    parser.add_argument('--repeats', type = int, default = 3)
+    parser.add_argument('--generations', type = int, default = 100, help = 'NSGA-II generations of the stages path')
+    parser.add_argument('--pop-size', type = int, default = 100, help = 'NSGA-II population of the stages path')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--output', default = None, help = 'json report, printed to stdout if not given')
+    parser.add_argument('--baseline', default = None, help = 'previous json report to check for regressions')
+    parser.add_argument('--tolerance', type = float, default = 1.5)
+    parser.add_argument('--workers', type = int, default = None, help = 'pool size of the engine (serial if not given), not used by summit')
+    parser.add_argument('--executor', choices = ['thread', 'process'], default = 'thread')
+    parser.add_argument('--islands', type = int, default = 1)
+    parser.add_argument('--surrogate', choices = ['exact', 'sparse'], default = 'exact',
+                        help = 'sparse: inducing point GPs, the exact GPs need O(n^2) memory at 10k points')
+    parser.add_argument('--n-inducing', type = int, default = 256)
+    args = parser.parse_args(argv)
+
+    parallel = {'workers': args.workers, 'executor': args.executor, 'islands': args.islands}
+    surrogate = {'surrogate': args.surrogate, 'n_inducing': args.n_inducing}
+    results = run(args.history, args.spectral, args.objectives, args.repeats, args.generations, args.pop_size, args.seed,
+                  parallel, surrogate, args.paths)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'generations': args.generations,
+            'pop_size': args.pop_size,
+            'repeats': args.repeats,
+            'paths': args.paths,
+            'parallel': parallel,
+            'surrogate': surrogate,
+        },
+        'results': results,
+    }
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as baseline_file:
+            report['regressions'] = compare(results, json.load(baseline_file), args.tolerance)
+
+    text = json.dumps(report, indent = 2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as output_file:
+            output_file.write(text)
+    return 1 if report.get('regressions') else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+'''
+Offline simulated campaigns with a synthetic electrochemistry objective.
+
+Two ways to use it:
+
+    # stand-in for the rig: answers every suggestion in xnewtrue1.csv with a result row in ynewtrue1.csv,
+    # run it next to an unmodified experiment script (time_scale 0.001 = 1000x faster than real time)
+    python campaign_simulator.py emulate --time-scale 0.001 --log emulator_log.jsonl
+
+    # whole campaign in one process, reports wall-clock per iteration and convergence per experiment
+    python campaign_simulator.py run --iterations 30 --initial 5 --refit-every 5 --output campaign.json
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from result_watcher import ResultWatcher
+from results_store import INPUT_OFFSET
+from discrete import nearest_level
+
+FARADAY = 96485.0
+INPUT_NAMES = ['RAE', 'Acid', 'Electrolyte', 'acid_type', 'Charge', 'Current']
+
+
+class ResponseSurface:
+    '''
+    Analytic stand-in for the electrochemical reaction.
+
+    UHPLC area = scale * conversion(Charge) * overoxidation(Charge) * selectivity(Current)
+                 * Gaussian bumps in RAE / Electrolyte / Acid * acid_type factor, plus noise.
+    The second output is a purity in %, the duration follows the charge passed at constant current.
+
+    :param params: dict overriding any entry of ResponseSurface.DEFAULTS
+    :param seed: seed of the measurement noise
+    '''
+
+    DEFAULTS = {
+        'scale': 1200.0,
+        'optimum': {'RAE': 2.8, 'Electrolyte': 1.8, 'Acid': 2.5},
+        'width': {'RAE': 0.8, 'Electrolyte': 0.9, 'Acid': 1.2},
+        'charge_rate': 0.6,          # conversion = 1 - exp(-charge_rate * Charge)
+        'overoxidation_charge': 4.5, # above this charge (F/mol) the product degrades
+        'overoxidation_width': 1.5,
+        'current_optimum': 6.0,      # mA
+        'current_width': 3.0,
+        'acid_type_factor': {0.25: 0.8, 0.75: 1.0},
+        'noise': 0.03,               # relative noise of the area
+        'concentration': 0.020,      # mol/L of the main reagent in the slug
+        'slug_volume': 360e-6,       # L
+        'overhead': 600.0,           # s of slug formation, transfer and analysis per experiment
+    }
+
+    def __init__(self, params = None, seed = None):
+        self.params = dict(ResponseSurface.DEFAULTS)
+        if params is not None:
+            self.params.update(params)
+        self.rng = np.random.default_rng(seed)
+
+    def mean(self, X):
+        #Noise free area and purity for inputs X (n x 6, INPUT_NAMES order)
+        p = self.params
+        X = np.atleast_2d(np.asarray(X, dtype = float))
+        x = {name: X[:, k] for k, name in enumerate(INPUT_NAMES)}
+        conversion = 1 - np.exp(-p['charge_rate'] * x['Charge'])
+        overoxidation = np.exp(-np.maximum(x['Charge'] - p['overoxidation_charge'], 0)**2 / (2 * p['overoxidation_width']**2))
+        selectivity = np.exp(-(x['Current'] - p['current_optimum'])**2 / (2 * p['current_width']**2))
+        bumps = np.ones(X.shape[0])
+        for name, optimum in p['optimum'].items():
+            bumps *= np.exp(-(x[name] - optimum)**2 / (2 * p['width'][name]**2))
+        nearest = nearest_level(x['acid_type'], sorted(p['acid_type_factor']))
+        acid = np.array([p['acid_type_factor'][l] for l in nearest])
+        area = p['scale'] * conversion * overoxidation * selectivity * bumps * acid
+        purity = 100 * selectivity * overoxidation**0.5
+        return area, purity
+
+    def evaluate(self, X):
+        area, purity = self.mean(X)
+        area = area * (1 + self.params['noise'] * self.rng.standard_normal(area.shape))
+        return np.maximum(area, 0), np.clip(purity + self.rng.normal(0, 1, purity.shape), 0, 100)
+
+    def duration(self, X):
+        #Wall-clock (s) of an experiment: overhead plus the time to pass Charge (F/mol) at Current (mA)
+        p = self.params
+        X = np.atleast_2d(np.asarray(X, dtype = float))
+        charge, current = X[:, INPUT_NAMES.index('Charge')], X[:, INPUT_NAMES.index('Current')]
+        return p['overhead'] + charge * FARADAY * p['concentration'] * p['slug_volume'] / (current / 1000)
+
+    def result_row(self, x):
+        #Result row in the ynewtrue1.csv layout (objectives first, conditions from INPUT_OFFSET on)
+        area, purity = self.evaluate(x)
+        row = [float(area[0]), float(purity[0])] + [0.0] * (INPUT_OFFSET - 2) + [float(v) for v in x]
+        return row
+
+
+class PlatformEmulator:
+    '''
+    Implements the rig side of the file contract: waits for a suggestion in x_path and answers it
+    with a result row in y_path after the simulated experiment duration times time_scale.
+
+    :param surface: ResponseSurface
+    :param time_scale: simulated seconds per real second (0 answers immediately)
+    :param log_path: optional json lines log with one entry per experiment
+    '''
+
+    def __init__(self, surface, x_path = 'xnewtrue1.csv', y_path = 'ynewtrue1.csv', time_scale = 0.001, log_path = None):
+        self.surface = surface
+        self.x_path = x_path
+        self.y_path = y_path
+        self.time_scale = time_scale
+        self.log_path = log_path
+        self.watcher = ResultWatcher(x_path, sep = ',', n_fields = len(INPUT_NAMES))
+        self.last_result_time = None
+
+    def run(self, max_experiments = None, timeout = None):
+        n = 0
+        while max_experiments is None or n < max_experiments:
+            x = self.watcher.wait_for_result(timeout = timeout)
+            if x is None:
+                break
+            received = time.time()
+            # time the optimizer needed between our last result and this suggestion
+            optimizer_latency = None if self.last_result_time is None else received - self.last_result_time
+            duration = float(self.surface.duration(x)[0])
+            time.sleep(duration * self.time_scale)
+            row = self.surface.result_row(x)
+            self._write(row)
+            self.last_result_time = time.time()
+            n += 1
+            entry = {'experiment': n, 'inputs': x, 'area': row[0], 'purity': row[1],
+                     'simulated_duration': duration, 'optimizer_latency': optimizer_latency, 'time': self.last_result_time}
+            print(json.dumps(entry))
+            if self.log_path is not None:
+                with open(self.log_path, 'a') as log_file:
+                    log_file.write(json.dumps(entry) + '\n')
+        self.watcher.close()
+        return n
+
+    def _write(self, row):
+        tmp_path = self.y_path + '.tmp'
+        with open(tmp_path, 'w') as y_file:
+            y_file.write(';'.join(str(v) for v in row) + '\n')
+        os.replace(tmp_path, self.y_path)
+
+
+def run_campaign(surface, domain, n_iterations = 30, n_initial = 5, batch_size = 1, seed = 0, engine_kwargs = None,
+                 prior = None, prior_noise = 4.0):
+    '''
+    Runs a whole campaign in-process with TSEMOEngine against the surface.
+    Returns one record per iteration with the optimizer wall-clock and the best area so far.
+    prior (DataFrame of earlier campaigns) warm starts the GPs, n_initial can then be 0.
+    '''
+    from tsemo_engine import TSEMOEngine
+    engine = TSEMOEngine(domain, seed = seed, **(engine_kwargs or {}))
+    engine.add_prior(prior, prior_noise)
+    objectives = engine.objectives
+
+    def observe(X):
+        #surface.evaluate returns one array per output, the first one is the area
+        outputs = surface.evaluate(X)
+        frame = pd.DataFrame(X, columns = engine.inputs)
+        for i, name in enumerate(objectives):
+            frame[name] = outputs[i]
+        engine.observe(frame)
+        return outputs[0]
+
+    best = float(observe(engine.unscale(engine.latin_hypercube(n_initial))).max()) if n_initial > 0 else -np.inf
+    records = []
+    simulated_time = 0.0
+    for iteration in range(n_iterations):
+        start = time.perf_counter()
+        suggestion = engine.suggest(batch_size)
+        optimizer_time = time.perf_counter() - start
+        X = suggestion[engine.inputs].to_numpy()
+        area = observe(X)
+        simulated_time += float(surface.duration(X).sum())
+        best = max(best, float(area.max()))
+        records.append({'iteration': iteration, 'n_experiments': int(engine.X.shape[0]), 'optimizer_time': optimizer_time,
+                        'simulated_time': simulated_time, 'area': area.tolist(), 'best_area': best})
+    return records
+
+def run_script_campaign(surface, con, n_iterations = 30, n_initial = 5, batch_size = 1, seed = 0, **optimizer_kwargs):
+    '''
+    Runs a whole campaign in-process with TSEMO_iteration, driven like the experiment scripts (rig_campaign.RigCampaign):
+    summit's TSEMO unless optimizer_kwargs has incremental = True, suggestions snapped onto the discrete levels and
+    only the results since the last fit passed to suggest_next. Returns the records of run_campaign.
+    '''
+    import TSEMO_iter
+    from summit import DataSet
+    from discrete import snap_discrete
+    dom = con.getDomain()
+    inputs = [v.name for v in dom.input_variables]
+    objectives = [v.name for v in dom.output_variables]
+    bounds = np.array([v.bounds for v in dom.input_variables], dtype = float)
+    optimizer = TSEMO_iter.TSEMO_iteration(con = con, **optimizer_kwargs)
+
+    def observe(X):
+        #results of the experiments X as the store hands them to the optimizer, and the area
+        outputs = surface.evaluate(X)
+        frame = pd.DataFrame(X, columns = inputs)
+        for i, name in enumerate(objectives):
+            frame[name] = outputs[i]
+        return frame, outputs[0]
+
+    # latin hypercube over the input bounds as initial design
+    rng = np.random.default_rng(seed)
+    cut = (np.arange(n_initial)[:, None] + rng.uniform(size = (n_initial, len(inputs)))) / n_initial
+    for j in range(cut.shape[1]):
+        cut[:, j] = rng.permutation(cut[:, j])
+    initial = snap_discrete(pd.DataFrame(bounds[:, 0] + cut * (bounds[:, 1] - bounds[:, 0]), columns = inputs), dom)
+    new, area = observe(initial.to_numpy())
+    best = float(area.max()) if n_initial > 0 else -np.inf
+    n_experiments = n_initial
+    records = []
+    simulated_time = 0.0
+    for iteration in range(n_iterations):
+        start = time.perf_counter()
+        line = snap_discrete(optimizer.suggest_next(DataSet.from_df(new), batch_size), dom)
+        optimizer_time = time.perf_counter() - start
+        X = line[inputs].to_numpy(dtype = float)
+        new, area = observe(X)
+        n_experiments += X.shape[0]
+        simulated_time += float(surface.duration(X).sum())
+        best = max(best, float(area.max()))
+        records.append({'iteration': iteration, 'n_experiments': n_experiments, 'optimizer_time': optimizer_time,
+                        'simulated_time': simulated_time, 'area': area.tolist(), 'best_area': best})
+    if optimizer.engine is not None:
+        optimizer.engine.shutdown()
+    return records
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Simulated electrochemistry campaigns')
+    sub = parser.add_subparsers(dest = 'mode', required = True)
+    emulate = sub.add_parser('emulate', help = 'answer xnewtrue1.csv with ynewtrue1.csv like the rig')
+    emulate.add_argument('--time-scale', type = float, default = 0.001)
+    emulate.add_argument('--max-experiments', type = int, default = None)
+    emulate.add_argument('--log', default = None)
+    emulate.add_argument('--seed', type = int, default = None)
+    run = sub.add_parser('run', help = 'in-process campaign with TSEMOEngine')
+    run.add_argument('--iterations', type = int, default = 30)
+    run.add_argument('--initial', type = int, default = 5)
+    run.add_argument('--batch-size', type = int, default = 1)
+    run.add_argument('--refit-every', type = int, default = 5)
+    run.add_argument('--spectral', type = int, default = 4000)
+    run.add_argument('--generations', type = int, default = 100)
+    run.add_argument('--seed', type = int, default = 0)
+    run.add_argument('--cost-aware', action = 'store_true', help = 'select by hypervolume improvement per hour')
+    run.add_argument('--prior', nargs = '*', default = [], help = 'results csv / sqlite files of earlier campaigns')
+    run.add_argument('--prior-noise', type = float, default = 4.0)
+    run.add_argument('--output', default = None)
+    args = parser.parse_args(argv)
+
+    if args.mode == 'emulate':
+        PlatformEmulator(ResponseSurface(seed = args.seed), time_scale = args.time_scale, log_path = args.log).run(args.max_experiments)
+        return 0
+
+    import constraints as constraints
+    engine_kwargs = {'refit_every': args.refit_every, 'n_spectral_points': args.spectral, 'generations': args.generations}
+    if args.cost_aware:
+        from cost_model import CostModel
+        engine_kwargs['cost_model'] = CostModel(INPUT_NAMES)
+    con = constraints.constraints()
+    prior = None
+    if args.prior:
+        from prior_campaigns import load_campaigns
+        prior = load_campaigns(args.prior, con)
+    records = run_campaign(ResponseSurface(seed = args.seed), con.getDomain(), args.iterations,
+                           args.initial, args.batch_size, args.seed, engine_kwargs, prior, args.prior_noise)
+    report = {'settings': vars(args), 'records': records,
+              'optimizer_time_per_iteration': float(np.mean([r['optimizer_time'] for r in records])),
+              'best_area': records[-1]['best_area'] if records else None}
+    text = json.dumps(report, indent = 2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as output_file:
+            output_file.write(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
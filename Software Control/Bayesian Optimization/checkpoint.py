@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import random
+import tempfile
+import numpy as np
+
+# Increased whenever the layout of the checkpoint changes, older checkpoints are refused
+CHECKPOINT_VERSION = 2
+
+
+class Checkpoint:
+    '''
+    Versioned json checkpoint of a campaign, replaced atomically (temporary file + os.replace)
+    so that a crash while saving leaves the previous checkpoint intact.
+
+    :param path: checkpoint file
+    '''
+
+    def __init__(self, path):
+        self.path = path
+
+    def save(self, state):
+        state = dict(state, version = CHECKPOINT_VERSION, saved = time.time())
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix = '.checkpoint', suffix = '.tmp', dir = directory)
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump(state, tmp_file)
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def load(self):
+        #Returns the saved state, None if there is no checkpoint yet
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r') as checkpoint_file:
+            state = json.load(checkpoint_file)
+        if state.get('version') != CHECKPOINT_VERSION:
+            raise ValueError(f"checkpoint {self.path} has version {state.get('version')}, expected {CHECKPOINT_VERSION}")
+        return state
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def rng_state():
+    #States of the global random, numpy and torch generators (the ones seeded by the fixed seed script)
+    kind, keys, pos, has_gauss, cached = np.random.get_state()
+    state = {'random': random.getstate(), 'numpy': [kind, keys.tolist(), pos, has_gauss, cached], 'torch': None}
+    try:
+        import torch
+        state['torch'] = torch.get_rng_state().tolist()
+    except ImportError:
+        pass
+    return state
+
+def restore_rng_state(state):
+    version, internal, gauss = state['random']
+    random.setstate((version, tuple(internal), gauss))
+    kind, keys, pos, has_gauss, cached = state['numpy']
+    np.random.set_state((kind, np.array(keys, dtype = np.uint32), pos, has_gauss, cached))
+    if state['torch'] is not None:
+        import torch
+        torch.set_rng_state(torch.tensor(state['torch'], dtype = torch.uint8))
+
+def campaign_config(domain, **settings):
+    #Domain and settings of a campaign as stored in its checkpoint, a checkpoint is only resumed with the same ones
+    return json.loads(json.dumps({'domain': domain.to_dict(), 'settings': settings}, sort_keys = True, default = str))
+
+def campaign_state(iteration, optimizer, queue, store, watcher, pending, config = None):
+    '''
+    Everything needed to resume a campaign after the experiment pending has been sent to the platform.
+
+    :param iteration: loop iteration that will receive the result of pending
+    :param optimizer: TSEMO_iteration
+    :param pending: inputs written to the platform (xnewtrue1.csv)
+    :param config: campaign_config of the campaign
+    '''
+    return {
+        'config': config,
+        'iteration': iteration,
+        'pending': None if pending is None else [float(v) for v in pending],
+        'queue': queue.rows,
+        'store': {'count': len(store), 'last_id': store.last_id},
+        'monitor_signature': watcher.result_signature,
+        'optimizer': optimizer.state_dict(),
+        'rng': rng_state(),
+    }
+
+def resume_campaign(state, optimizer, queue, store, watcher, config = None):
+    '''
+    Restores a campaign from a checkpoint without refitting the models and works out what
+    happened to the pending experiment while the script was down.
+    Raises ValueError if the checkpoint was saved with another config (campaign_config).
+
+    :return: (status, iteration, outputs) with status
+        'waiting': the result of the pending experiment has not arrived yet, keep waiting for it
+        'arrived': the result arrived while the script was down, outputs holds it
+        'stored': the result was already stored, only the next suggestion is missing
+    '''
+    if state.get('config') != config:
+        raise ValueError("the checkpoint was saved by a campaign with another domain or other settings, "
+                         "delete it to start a new campaign")
+    optimizer.load_state_dict(state['optimizer'])
+    restore_rng_state(state['rng'])
+    queue.clear()
+    queue.push(state['queue'])
+    store.last_id = state['store']['last_id']
+    iteration = state['iteration']
+
+    if len(store) > state['store']['count']:
+        return 'stored', iteration + 1, None
+    # the monitor file was written since the checkpoint, even if with the same row as before
+    signature = watcher.result_signature
+    saved = state['monitor_signature']
+    changed = signature is not None and (saved is None or list(signature) != list(saved))
+    if state['pending'] is not None and changed and watcher.last_content is not None:
+        outputs = watcher.parse(watcher.last_content)
+        if outputs is not None:
+            return 'arrived', iteration, outputs
+    return 'waiting', iteration, None
@@ -1,5 +1,6 @@
 # Import summit
 import summit.domain as domain
+from discrete import DiscreteVariable
 
 # Set up the strategy, passing in the optimisation domain and transform
 class constraints:
@@ -7,7 +8,8 @@ class constraints:
     RAE = domain.ContinuousVariable("RAE", "RAE", [1, 4])
     electrolyte = domain.ContinuousVariable("Electrolyte", "Electrolyte", [1, 3])
     acid = domain.ContinuousVariable("Acid", "Acid", [1, 4])
-    acid_type = domain.ContinuousVariable("acid_type", "acid_type", [0, 1])
+    # acid vial 6 (0.25) or 7 (0.75), see Run_No_Client.recipe_calculation
+    acid_type = DiscreteVariable("acid_type", "acid_type", [0.25, 0.75])
     charge = domain.ContinuousVariable("Charge", "Charge", [2, 6])
     current = domain.ContinuousVariable("Current", "Current", [4, 10])
     area = domain.ContinuousVariable("UHPLC_Area", "Area", [0, 2000], is_objective = True)
@@ -0,0 +1,73 @@
+import numpy as np
+
+FARADAY = 96485.0
+
+
+def reaction_time(charge, current, concentration = 20, slug_volume = 360):
+    '''
+    Time (s) to pass charge (F/mol of the main reagent) at a constant current (mA) through a slug of
+    slug_volume (uL) with concentration (mM) of the main reagent, as run by Procedures.Perform_Reaction.
+    '''
+    moles = concentration * slug_volume * 1e-9
+    return np.asarray(charge, dtype = float) * FARADAY * moles / (np.asarray(current, dtype = float) / 1000)
+
+
+class CostModel:
+    '''
+    Predicted wall-clock of an experiment from its conditions:
+    duration = overhead + scale * reaction time (Charge, Current).
+    overhead (slug formation, transfer, analysis) and scale are fitted to past durations.
+
+    :param inputs: input variable names in domain order
+    :param overhead: duration (s) independent of the conditions until fitted
+    '''
+
+    def __init__(self, inputs, overhead = 600.0, scale = 1.0, concentration = 20, slug_volume = 360):
+        self.inputs = list(inputs)
+        self.charge = self.inputs.index('Charge')
+        self.current = self.inputs.index('Current')
+        self.overhead = overhead
+        self.scale = scale
+        self.concentration = concentration
+        self.slug_volume = slug_volume
+        self.n_fitted = 0
+
+    def reaction_time(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype = float))
+        return reaction_time(X[:, self.charge], X[:, self.current], self.concentration, self.slug_volume)
+
+    def predict(self, X):
+        #Duration (s) of the experiments X (unscaled inputs in domain order)
+        return self.overhead + self.scale * self.reaction_time(X)
+
+    def predict_hours(self, X):
+        return self.predict(X) / 3600
+
+    def fit(self, X, durations):
+        #Least squares fit of overhead and scale, keeps the current values with fewer than 3 durations
+        durations = np.asarray(durations, dtype = float)
+        if durations.size < 3:
+            return self
+        A = np.column_stack([np.ones(durations.size), self.reaction_time(X)])
+        (overhead, scale), *_ = np.linalg.lstsq(A, durations, rcond = None)
+        if scale <= 0:
+            # conditions do not explain the durations, only the overhead is left
+            overhead, scale = float(np.median(durations)), 0.0
+        self.overhead, self.scale = max(float(overhead), 0.0), float(scale)
+        self.n_fitted = durations.size
+        return self
+
+    def fit_store(self, store, min_duration = 60, max_factor = 5):
+        '''
+        Fits to the time between consecutive results of a ResultsStore. Gaps shorter than min_duration (s),
+        e.g. imported rows, or longer than max_factor times the median (pauses of the rig) are left out.
+        '''
+        frame = store.fetch_all(created = True)
+        if len(frame) < 2:
+            return self
+        durations = np.diff(frame['created'].to_numpy())
+        X = frame[self.inputs].to_numpy()[1:]
+        keep = (durations >= min_duration) & np.all(np.isfinite(X), axis = 1)
+        if np.any(keep):
+            keep &= durations <= max_factor * np.median(durations[keep])
+        return self.fit(X[keep], durations[keep])
@@ -0,0 +1,46 @@
+import numpy as np
+import summit.domain as domain
+
+
+class DiscreteVariable(domain.ContinuousVariable):
+    '''
+    Input that can only take a few numeric levels, e.g. the acid selected by acid_type.
+    To summit it is a continuous variable between the lowest and highest level. The incremental
+    engine (tsemo_engine) optimises it on its levels only, other strategies need snap_discrete.
+
+    :param name: name of the variable
+    :param description: description of the variable
+    :param levels: list of the values it can take
+    '''
+
+    def __init__(self, name, description, levels, **kwargs):
+        levels = sorted(float(l) for l in levels)
+        if len(levels) < 2:
+            raise ValueError(f"{name} needs at least two levels")
+        super().__init__(name, description, [levels[0], levels[-1]], **kwargs)
+        self.levels = levels
+
+    def to_dict(self):
+        # summit rebuilds serialised domains (strategy checkpoints) by type name, there it is continuous
+        variable_dict = super().to_dict()
+        variable_dict['type'] = 'ContinuousVariable'
+        return variable_dict
+
+
+def discrete_levels(dom):
+    #{input column: levels} of the discrete inputs of a domain
+    return {j: np.array(v.levels) for j, v in enumerate(dom.input_variables) if isinstance(v, DiscreteVariable)}
+
+def nearest_level(values, levels):
+    levels = np.asarray(levels, dtype = float)
+    values = np.asarray(values, dtype = float).ravel()
+    return levels[np.argmin(np.abs(values[:, None] - levels[None, :]), axis = 1)]
+
+def snap_discrete(frame, dom):
+    #Moves the discrete inputs of suggestions (DataFrame or summit DataSet) onto their nearest level
+    names = list(frame.columns.get_level_values(0))
+    for v in dom.input_variables:
+        if isinstance(v, DiscreteVariable):
+            j = names.index(v.name)
+            frame.iloc[:, j] = nearest_level(frame.iloc[:, j], v.levels)
+    return frame
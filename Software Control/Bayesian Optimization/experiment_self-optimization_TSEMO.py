@@ -1,94 +1,49 @@
-import os
-import time
-import TSEMO_iter as TSEMO_iter
-import pandas as pd
-import numpy as np
 import constraints as constraints
+from rig_campaign import RigCampaign
 
 
-from summit import DataSet
-
 # Specify file paths
 output_file_path = 'xnewtrue1.csv'
 monitor_file_path = 'ynewtrue1.csv'
 result_file_path = 'results.csv'
-
-def convert_results_to_init(results):
-    return (pd.concat([results.iloc[:,7:13], results.iloc[:,0]], axis = 1))
-
+queue_file_path = 'xqueue.csv'
+
+# Number of experiments suggested per optimizer fit. The batch is written to the queue file
+# and handed out one by one to xnewtrue1.csv, the optimizer only refits when the queue is empty
+batch_size = 1
+
+# Keep the surrogate models between iterations and only refit them from scratch every refit_every iterations
+# (in-repo engine, tsemo_engine.py). False runs summit's TSEMO, which reproduces the published campaigns
+incremental = False
+refit_every = 5
+# Precompute the next suggestion while the platform runs the current experiment from believer data (needs incremental).
+# None proposes from the measured results only. Use 'thread', not 'process': this script has no __main__ guard
+# (a spawned worker process would re-run it on Windows)
+speculative = None
+# Fit and sample the objectives on a pool of workers threads (needs incremental, None runs them serially). islands > 1 splits
+# the NSGA-II population into islands, which changes the suggestions for a seed, keep 1 to reproduce campaigns
+workers = None
+islands = 1
+# Select by hypervolume improvement per hour of rig time, with the duration predicted from Charge / Current
+# and fitted to the time between past results (needs incremental)
+cost_aware = False
+# Learn where experiments fail from the failures recorded in the store and keep such candidates away from the rig
+# (needs incremental). Failures are recorded in the store either way
+feasibility_filter = False
+# Warm start the models with the results (csv files or .sqlite stores) of earlier campaigns on the same domain,
+# their noise is prior_noise times that of this campaign's results (needs incremental)
+prior_campaigns = []
+prior_noise = 4.0
 # init file path depreciated in future version
 init_file_path = 'init.csv'
-
-con = constraints.constraints()
-
-#init = pd.read_csv(init_file_path, sep = ",", header = None)
-#initfiltered = pd.concat([init.iloc[:,1:6], init.iloc[:,0]], axis = 1)
-initfiltered = convert_results_to_init(pd.read_csv(result_file_path,sep = ",", header = None))
-print(initfiltered)
-initfiltered.columns = con.getCols()
-print(initfiltered)
 maxiter = 60
-iter = TSEMO_iter.TSEMO_iteration()
-
-
-line = iter.suggest_next(DataSet.from_df(initfiltered))
-a = line.iloc[0,3]
-if a > 0.5:
-    line.iloc[0,3] = 0.75
-else:
-    line.iloc[0,3] = 0.25    
 
-print(line[line.data_columns])
-
-with open(output_file_path, 'w') as output_file:
-    output_file.write(line[line.data_columns].iloc[:,0:6].to_csv(sep = ',', header = None, index = None).replace('\r', ''))
-print(line[line.data_columns].to_csv(sep = ',', header = None, index = None).replace('\r', ''))
-
-# Open the output file for writing
-    # Read each line from the input file
-for i in range(maxiter):
-    # Wait for the monitor file to be modified
-    current_time = os.path.getmtime(monitor_file_path)
-    while True:
-        time.sleep(1)
-        if os.path.getmtime(monitor_file_path) > current_time:
-
-            #write results of previous experiment to results file
-            outputs = pd.read_csv(monitor_file_path, sep = ';', header = None)
-            outputs = outputs.iloc[:,0:13]
-            print(outputs)
-            outputs_str = outputs.to_csv(sep = ",",index=False, header = False)
-            outputs_str = outputs_str.replace('\n', '')
-
-            result = outputs_str
-            try:
-                with open(result_file_path, 'a') as result_file:
-                    result_file.write(result)
-            except:
-                with open(result_file_path, 'a') as result_file:
-                    result_file.write('0,0,0,0,0,0,0,0,0,0,0')
-             
-            print("")                       
-            print(i)
-            print("Result:")
-            print(result)
-            print("")
-
-            #read in all previous results and suggest new experiment
-            results = pd.read_csv(result_file_path, sep = ',', header = None)
-            resline = pd.concat([results.iloc[:,7:13], results.iloc[:,0]], axis = 1)
-            resline.columns = con.getCols()
-
-            line = iter.suggest_next(DataSet.from_df(resline))
-            a = line.iloc[0,3]
-            if a > 0.5:
-                line.iloc[0,3] = 0.75
-            else:
-                line.iloc[0,3] = 0.25    
-
-            with open(output_file_path, 'w') as output_file:
-                output_file.write(line[line.data_columns].iloc[:,0:7].to_csv(sep = ',', header = None, index = None).replace('\r', ''))
-            print(line[line.data_columns].to_csv(sep = ',', header = None, index = None).replace('\r', ''))
-            time.sleep(30)
-            break
-print("Done")
\ No newline at end of file
+con = constraints.constraints()
+# The store (.sqlite) and the checkpoint (_checkpoint.json) are kept next to the results file
+campaign = RigCampaign(con, output_file_path = output_file_path, monitor_file_path = monitor_file_path,
+                       result_file_path = result_file_path, queue_file_path = queue_file_path,
+                       batch_size = batch_size, n_columns = 6, cost_aware = cost_aware,
+                       feasibility_filter = feasibility_filter, prior_campaigns = prior_campaigns, prior_noise = prior_noise,
+                       incremental = incremental, refit_every = refit_every, speculative = speculative,
+                       workers = workers, executor = 'thread', islands = islands)
+campaign.run(maxiter)
@@ -0,0 +1,61 @@
+import numpy as np
+from scipy.special import ndtr
+from gp_surrogate import GPModel
+
+
+class FeasibilityModel:
+    '''
+    Probability that an experiment fails, learned from the feasibility labels of the store.
+
+    A GP regression on the labels (+1 feasible, -1 failed) squashed with the probit link
+    (least squares GP classification). It reuses the Matern GP of the optimizer and fits in
+    milliseconds for the size of a campaign. Until the first failure every candidate is feasible.
+
+    :param inputs: input variable names in domain order
+    :param bounds: bounds of the inputs (n x 2), used to scale them to [0,1]
+    :param max_failure: candidates with a higher failure probability are not sent to the rig
+    '''
+
+    def __init__(self, inputs, bounds, max_failure = 0.5):
+        self.inputs = list(inputs)
+        self.bounds = np.asarray(bounds, dtype = float)
+        self.max_failure = max_failure
+        self.model = None
+
+    @classmethod
+    def from_domain(cls, domain, max_failure = 0.5):
+        inputs = domain.input_variables
+        return cls([v.name for v in inputs], [v.bounds for v in inputs], max_failure)
+
+    @property
+    def fitted(self):
+        return self.model is not None
+
+    def fit(self, X, feasible):
+        #X unscaled inputs in domain order, feasible booleans
+        X = np.atleast_2d(np.asarray(X, dtype = float))
+        feasible = np.asarray(feasible, dtype = bool)
+        keep = np.all(np.isfinite(X), axis = 1)
+        X, feasible = X[keep], feasible[keep]
+        if np.all(feasible):
+            self.model = None
+            return self
+        y = np.where(feasible, 1.0, -1.0)
+        model = GPModel(len(self.inputs)) if self.model is None else self.model
+        self.model = model.fit(self._scale(X), y, maxiter = 50)
+        return self
+
+    def fit_store(self, store):
+        frame = store.fetch_all(feasible = True)
+        return self.fit(frame[self.inputs].to_numpy(), frame['feasible'].to_numpy() > 0)
+
+    def predict_failure(self, X):
+        #Failure probability of the (unscaled) inputs X
+        X = np.atleast_2d(np.asarray(X, dtype = float))
+        if self.model is None:
+            return np.zeros(X.shape[0])
+        mean, var = self.model.predict(self._scale(X))
+        return ndtr(-mean / np.sqrt(1 + var))
+
+    def _scale(self, X):
+        return (X - self.bounds[:, 0]) / (self.bounds[:, 1] - self.bounds[:, 0])
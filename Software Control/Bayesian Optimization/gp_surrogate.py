@@ -0,0 +1,365 @@
+import numpy as np
+from scipy.linalg import cho_solve, solve_triangular
+from scipy.optimize import minimize
+
+SQRT5 = np.sqrt(5.0)
+
+# Gamma priors (concentration, rate) on the hyperparameters, same as botorch's SingleTaskGP
+LENGTHSCALE_PRIOR = (3.0, 6.0)
+OUTPUTSCALE_PRIOR = (2.0, 0.15)
+NOISE_PRIOR = (1.1, 0.05)
+
+# Bounds of the log hyperparameters
+LOG_LENGTHSCALE_BOUNDS = (np.log(1e-2), np.log(1e2))
+LOG_OUTPUTSCALE_BOUNDS = (np.log(1e-3), np.log(1e3))
+LOG_NOISE_BOUNDS = (np.log(1e-6), np.log(10.0))
+
+
+def matern52(X1, X2, lengthscales, outputscale):
+    r = _distance(X1 / lengthscales, X2 / lengthscales)
+    return outputscale * (1 + SQRT5 * r + 5.0 / 3.0 * r**2) * np.exp(-SQRT5 * r)
+
+def _distance(A, B):
+    d2 = np.sum(A**2, axis = 1)[:, None] + np.sum(B**2, axis = 1)[None, :] - 2 * A @ B.T
+    return np.sqrt(np.maximum(d2, 0))
+
+def _factors(noise_factors, n):
+    return np.ones(n) if noise_factors is None else np.asarray(noise_factors, dtype = float).ravel()
+
+def _cholesky(K):
+    #Cholesky factor with increasing jitter for badly conditioned kernels
+    jitter = 0
+    for _ in range(6):
+        try:
+            return np.linalg.cholesky(K + jitter * np.eye(K.shape[0]))
+        except np.linalg.LinAlgError:
+            jitter = 1e-8 if jitter == 0 else jitter * 10
+    raise np.linalg.LinAlgError('kernel matrix is not positive definite')
+
+
+class GPModel:
+    '''
+    Exact GP with an ARD Matern 5/2 kernel for inputs scaled to [0,1] and standardised outputs.
+    The hyperparameters (log lengthscales, log outputscale, log noise) are MAP estimates found with
+    L-BFGS-B and are kept between fits, so a refit can start from the previous solution.
+    noise_factors scale the noise of single points, e.g. > 1 to down-weight results of earlier campaigns.
+
+    :param n_dim: number of input dimensions
+    '''
+
+    def __init__(self, n_dim):
+        self.n_dim = n_dim
+        self.theta = self.default_theta()
+        self.X = None
+        self.y = None
+        self.L = None
+        self.alpha = None
+        self.noise_factors = None
+
+    def default_theta(self):
+        #Prior modes as starting point
+        lengthscale = (LENGTHSCALE_PRIOR[0] - 1) / LENGTHSCALE_PRIOR[1]
+        outputscale = (OUTPUTSCALE_PRIOR[0] - 1) / OUTPUTSCALE_PRIOR[1]
+        return np.concatenate([np.full(self.n_dim, np.log(lengthscale)), [np.log(min(outputscale, 1.0)), np.log(1e-2)]])
+
+    @property
+    def lengthscales(self):
+        return np.exp(self.theta[:self.n_dim])
+
+    @property
+    def outputscale(self):
+        return float(np.exp(self.theta[self.n_dim]))
+
+    @property
+    def noise(self):
+        return float(np.exp(self.theta[self.n_dim + 1]))
+
+    def fit(self, X, y, restarts = 0, maxiter = None, rng = None, noise_factors = None):
+        '''
+        Fits the hyperparameters starting from the current ones.
+        restarts adds random starting points, maxiter limits the L-BFGS-B iterations (short warm started refit).
+        '''
+        X = np.asarray(X, dtype = float)
+        y = np.asarray(y, dtype = float).ravel()
+        factors = _factors(noise_factors, X.shape[0])
+        rng = np.random.default_rng() if rng is None else rng
+        self._optimise(X, y, factors, restarts, maxiter, rng)
+        self.set_data(X, y, factors)
+        return self
+
+    def _optimise(self, X, y, factors, restarts, maxiter, rng):
+        #MAP hyperparameters on (X, y) with L-BFGS-B from the current and restarts further starting points
+        starts = [self.theta]
+        if restarts > 0:
+            starts.append(self.default_theta())
+            bounds = np.array(self._bounds())
+            for _ in range(restarts - 1):
+                starts.append(rng.uniform(bounds[:, 0], bounds[:, 1]) * 0.5 + self.default_theta() * 0.5)
+        options = {} if maxiter is None else {'maxiter': maxiter}
+
+        best_theta, best_value = self.theta, np.inf
+        for theta0 in starts:
+            try:
+                res = minimize(self._objective, theta0, args = (X, y, factors), jac = True, method = 'L-BFGS-B',
+                               bounds = self._bounds(), options = options)
+            except np.linalg.LinAlgError:
+                continue
+            if res.fun < best_value:
+                best_theta, best_value = res.x, res.fun
+        self.theta = best_theta
+
+    def set_data(self, X, y, noise_factors = None):
+        #Conditions the GP on (X, y) with the current hyperparameters
+        self.X = np.asarray(X, dtype = float)
+        self.y = np.asarray(y, dtype = float).ravel()
+        self.noise_factors = _factors(noise_factors, self.X.shape[0])
+        self.L = _cholesky(self._kernel_matrix(self.X))
+        self.alpha = cho_solve((self.L, True), self.y)
+
+    def state_dict(self):
+        #Hyperparameters and conditioning data, json serialisable
+        return {'theta': self.theta.tolist(),
+                'X': None if self.X is None else self.X.tolist(),
+                'y': None if self.y is None else self.y.tolist(),
+                'noise_factors': None if self.noise_factors is None else self.noise_factors.tolist()}
+
+    def load_state_dict(self, state):
+        #Restores a state_dict, the Cholesky factor is recomputed without optimising the hyperparameters
+        self.theta = np.asarray(state['theta'], dtype = float)
+        if state['X'] is not None:
+            self.set_data(np.asarray(state['X'], dtype = float).reshape(-1, self.n_dim), state['y'], state.get('noise_factors'))
+        return self
+
+    def add_point(self, x, y):
+        '''
+        Rank-one extension of the Cholesky factor with one new input x, hyperparameters unchanged.
+        y are the (re-standardised) targets of all points including the new one.
+        '''
+        x = np.atleast_2d(np.asarray(x, dtype = float))
+        factors = np.append(self.noise_factors, 1.0)
+        k = matern52(self.X, x, self.lengthscales, self.outputscale)[:, 0]
+        l = solve_triangular(self.L, k, lower = True)
+        d = self.outputscale + self.noise - l @ l
+        if d <= 1e-12:
+            # numerically dependent on the data, fall back to a fresh factorisation
+            self.set_data(np.vstack([self.X, x]), y, factors)
+            return self
+        n = self.L.shape[0]
+        L = np.zeros((n + 1, n + 1))
+        L[:n, :n] = self.L
+        L[n, :n] = l
+        L[n, n] = np.sqrt(d)
+        self.L = L
+        self.X = np.vstack([self.X, x])
+        self.y = np.asarray(y, dtype = float).ravel()
+        self.noise_factors = factors
+        self.alpha = cho_solve((self.L, True), self.y)
+        return self
+
+    def predict(self, Xs):
+        #Latent mean and variance at Xs
+        Ks = matern52(np.atleast_2d(Xs), self.X, self.lengthscales, self.outputscale)
+        mean = Ks @ self.alpha
+        v = solve_triangular(self.L, Ks.T, lower = True)
+        var = np.maximum(self.outputscale - np.sum(v**2, axis = 0), 1e-12)
+        return mean, var
+
+    def sample_path(self, n_features, rng):
+        '''
+        Thompson sample of the posterior as a deterministic function (pathwise conditioning):
+        a random Fourier feature draw of the prior plus an exact kernel update on the data.
+        Costs O(n M) instead of the O(M^3) of sampling the feature weights from their posterior.
+        '''
+        omega, bias, weights = self._prior_features(n_features, rng)
+        path = SamplePath(omega, bias, weights * np.sqrt(2 * self.outputscale / n_features), self.X, self.lengthscales, self.outputscale)
+        epsilon = rng.standard_normal(self.X.shape[0]) * np.sqrt(self.noise * self.noise_factors)
+        path.v = cho_solve((self.L, True), self.y - path.prior(self.X) - epsilon)
+        return path
+
+    def _prior_features(self, n_features, rng):
+        # Matern 5/2 spectral density is a multivariate t with 5 degrees of freedom
+        z = rng.standard_normal((n_features, self.n_dim))
+        u = rng.chisquare(5, size = (n_features, 1))
+        omega = z * np.sqrt(5 / u) / self.lengthscales
+        bias = rng.uniform(0, 2 * np.pi, n_features)
+        weights = rng.standard_normal(n_features)
+        return omega, bias, weights
+
+    def _kernel_matrix(self, X):
+        return matern52(X, X, self.lengthscales, self.outputscale) + np.diag(self.noise * self.noise_factors)
+
+    def _bounds(self):
+        return [LOG_LENGTHSCALE_BOUNDS] * self.n_dim + [LOG_OUTPUTSCALE_BOUNDS, LOG_NOISE_BOUNDS]
+
+    def _objective(self, theta, X, y, factors):
+        #Negative log marginal likelihood plus log prior and its gradient
+        n, d = X.shape
+        lengthscales = np.exp(theta[:d])
+        outputscale = np.exp(theta[d])
+        noise = np.exp(theta[d + 1])
+
+        Xs = X / lengthscales
+        r = _distance(Xs, Xs)
+        e = np.exp(-SQRT5 * r)
+        K = outputscale * (1 + SQRT5 * r + 5.0 / 3.0 * r**2) * e
+        L = _cholesky(K + np.diag(noise * factors))
+        alpha = cho_solve((L, True), y)
+        mll = -0.5 * y @ alpha - np.sum(np.log(np.diag(L))) - 0.5 * n * np.log(2 * np.pi)
+
+        W = np.outer(alpha, alpha) - cho_solve((L, True), np.eye(n))
+        grad = np.zeros(d + 2)
+        A = W * (outputscale * 5.0 / 3.0 * (1 + SQRT5 * r) * e)
+        rowsum = A.sum(axis = 1)
+        for k in range(d):
+            x = Xs[:, k]
+            grad[k] = 0.5 * (2 * rowsum @ x**2 - 2 * x @ A @ x)
+        grad[d] = 0.5 * np.sum(W * K)
+        grad[d + 1] = 0.5 * noise * np.diag(W) @ factors
+
+        # log Gamma priors in log space (including the Jacobian)
+        a, b = LENGTHSCALE_PRIOR
+        prior = np.sum(a * theta[:d] - b * lengthscales)
+        grad[:d] += a - b * lengthscales
+        a, b = OUTPUTSCALE_PRIOR
+        prior += a * theta[d] - b * outputscale
+        grad[d] += a - b * outputscale
+        a, b = NOISE_PRIOR
+        prior += a * theta[d + 1] - b * noise
+        grad[d + 1] += a - b * noise
+
+        return -(mll + prior), -grad
+
+
+class SparseGPModel(GPModel):
+    '''
+    Inducing point GP (variational SGPR posterior, Titsias 2009) for histories of thousands of points,
+    same interface as GPModel. With n points and m inducing points a fit costs O(n m^2) and the memory
+    is O(n m) instead of O(n^3) and O(n^2), predictions and sampled paths cost O(m) per input.
+
+    The hyperparameters are MAP estimates of the exact GP on a random subset of fit_size points.
+    The inducing points are picked among the data by a greedy pivoted Cholesky of the kernel (the point
+    with the largest remaining variance first), they are chosen again by every fit. With n <= n_inducing
+    every point is an inducing point and the posterior is the exact one.
+
+    :param n_dim: number of input dimensions
+    :param n_inducing: maximal number of inducing points
+    :param fit_size: maximal number of points the hyperparameters are fitted on
+    '''
+
+    def __init__(self, n_dim, n_inducing = 256, fit_size = 512):
+        super().__init__(n_dim)
+        self.n_inducing = n_inducing
+        self.fit_size = fit_size
+        self.Z = None
+        self.Lm = None
+        self.A = None
+        self.B = None
+        self.LB = None
+        self.mu = None
+
+    def fit(self, X, y, restarts = 0, maxiter = None, rng = None, noise_factors = None):
+        X = np.asarray(X, dtype = float)
+        y = np.asarray(y, dtype = float).ravel()
+        factors = _factors(noise_factors, X.shape[0])
+        rng = np.random.default_rng() if rng is None else rng
+        subset = np.arange(X.shape[0])
+        if X.shape[0] > self.fit_size:
+            subset = rng.choice(X.shape[0], self.fit_size, replace = False)
+        self._optimise(X[subset], y[subset], factors[subset], restarts, maxiter, rng)
+        self.set_data(X, y, factors)
+        return self
+
+    def set_data(self, X, y, noise_factors = None):
+        #Chooses the inducing points and conditions on (X, y) with the current hyperparameters
+        self.X = np.asarray(X, dtype = float)
+        self.y = np.asarray(y, dtype = float).ravel()
+        self.noise_factors = _factors(noise_factors, self.X.shape[0])
+        self.Z = self._inducing_points(self.X)
+        Kmm = matern52(self.Z, self.Z, self.lengthscales, self.outputscale)
+        self.Lm = _cholesky(Kmm + 1e-6 * self.outputscale * np.eye(self.Z.shape[0]))
+        # A = Lm^-1 Kmn / noise std, the data enters the posterior only through A A^T and A y
+        Kmn = matern52(self.Z, self.X, self.lengthscales, self.outputscale)
+        self.A = solve_triangular(self.Lm, Kmn, lower = True) / np.sqrt(self.noise * self.noise_factors)
+        self.B = np.eye(self.Z.shape[0]) + self.A @ self.A.T
+        self._condition()
+
+    def add_point(self, x, y):
+        #Adds one input with the inducing points and hyperparameters unchanged, O(n m + m^3)
+        x = np.atleast_2d(np.asarray(x, dtype = float))
+        a = solve_triangular(self.Lm, matern52(self.Z, x, self.lengthscales, self.outputscale)[:, 0], lower = True) / np.sqrt(self.noise)
+        self.X = np.vstack([self.X, x])
+        self.y = np.asarray(y, dtype = float).ravel()
+        self.noise_factors = np.append(self.noise_factors, 1.0)
+        self.A = np.column_stack([self.A, a])
+        self.B += np.outer(a, a)
+        self._condition()
+        return self
+
+    def predict(self, Xs):
+        #Latent mean and variance at Xs
+        t1 = solve_triangular(self.Lm, matern52(self.Z, np.atleast_2d(Xs), self.lengthscales, self.outputscale), lower = True)
+        t2 = solve_triangular(self.LB, t1, lower = True)
+        mean = t1.T @ self.mu
+        var = np.maximum(self.outputscale - np.sum(t1**2, axis = 0) + np.sum(t2**2, axis = 0), 1e-12)
+        return mean, var
+
+    def sample_path(self, n_features, rng):
+        '''
+        Thompson sample by pathwise conditioning on the inducing points: a prior draw plus the kernel
+        update that moves it to a draw u of the inducing values from their posterior.
+        '''
+        omega, bias, weights = self._prior_features(n_features, rng)
+        path = SamplePath(omega, bias, weights * np.sqrt(2 * self.outputscale / n_features), self.Z, self.lengthscales, self.outputscale)
+        # whitened inducing values u = Lm w with w ~ N(mu, B^-1)
+        w = self.mu + solve_triangular(self.LB.T, rng.standard_normal(self.Z.shape[0]), lower = False)
+        prior_w = solve_triangular(self.Lm, path.prior(self.Z), lower = True)
+        path.v = solve_triangular(self.Lm.T, w - prior_w, lower = False)
+        return path
+
+    def _condition(self):
+        #Posterior of the whitened inducing values N(mu, B^-1)
+        self.LB = _cholesky(self.B)
+        c = solve_triangular(self.LB, self.A @ (self.y / np.sqrt(self.noise * self.noise_factors)), lower = True)
+        self.mu = solve_triangular(self.LB.T, c, lower = False)
+
+    def _inducing_points(self, X):
+        n = X.shape[0]
+        if n <= self.n_inducing:
+            return X.copy()
+        # greedy pivoted Cholesky of the kernel matrix, rows of the factor are kept as they are computed
+        residual = np.full(n, self.outputscale)
+        rows = np.zeros((self.n_inducing, n))
+        chosen = []
+        for j in range(self.n_inducing):
+            i = int(np.argmax(residual))
+            if residual[i] <= 1e-6 * self.outputscale:
+                break
+            k = matern52(X, X[i:i + 1], self.lengthscales, self.outputscale)[:, 0]
+            rows[j] = (k - rows[:j].T @ rows[:j, i]) / np.sqrt(residual[i])
+            residual = np.maximum(residual - rows[j]**2, 0)
+            residual[i] = 0
+            chosen.append(i)
+        return X[chosen]
+
+
+class SamplePath:
+    '''
+    Sampled function returned by GPModel.sample_path. A plain object instead of a closure so that
+    samples can be drawn in worker processes and sent back.
+    '''
+
+    def __init__(self, omega, bias, weights, X, lengthscales, outputscale):
+        self.omega = omega
+        self.bias = bias
+        self.weights = weights
+        self.X = X
+        self.lengthscales = lengthscales
+        self.outputscale = outputscale
+        self.v = None
+
+    def prior(self, Z):
+        return np.cos(Z @ self.omega.T + self.bias) @ self.weights
+
+    def __call__(self, Z):
+        Z = np.atleast_2d(Z)
+        return self.prior(Z) + matern52(Z, self.X, self.lengthscales, self.outputscale) @ self.v
@@ -0,0 +1,82 @@
+import numpy as np
+
+# All functions assume minimisation of every objective
+
+
+def pareto_mask(Y):
+    #Boolean mask of the non-dominated rows of Y
+    Y = np.atleast_2d(Y)
+    mask = np.ones(Y.shape[0], dtype = bool)
+    for i in range(Y.shape[0]):
+        if not mask[i]:
+            continue
+        dominated = np.all(Y[i] <= Y, axis = 1) & np.any(Y[i] < Y, axis = 1)
+        mask[dominated] = False
+    return mask
+
+def hypervolume(Y, ref):
+    #Exact hypervolume dominated by Y and bounded by the reference point ref
+    Y = np.atleast_2d(np.asarray(Y, dtype = float))
+    ref = np.asarray(ref, dtype = float)
+    Y = Y[np.all(Y < ref, axis = 1)]
+    if Y.shape[0] == 0:
+        return 0.0
+    if Y.shape[1] == 1:
+        return float(ref[0] - Y[:, 0].min())
+    Y = Y[pareto_mask(Y)]
+    if Y.shape[1] == 2:
+        return _hypervolume_2d(Y, ref)
+    return _hypervolume_slicing(Y, ref)
+
+def _hypervolume_2d(Y, ref):
+    Y = Y[np.argsort(Y[:, 0])]
+    widths = np.diff(np.append(Y[:, 0], ref[0]))
+    return float(np.sum(widths * (ref[1] - Y[:, 1])))
+
+def _hypervolume_slicing(Y, ref):
+    #Slices along the last objective and sums the (d-1) dimensional volumes
+    Y = Y[np.argsort(Y[:, -1])]
+    volume = 0.0
+    for i in range(Y.shape[0]):
+        upper = Y[i + 1, -1] if i + 1 < Y.shape[0] else ref[-1]
+        depth = upper - Y[i, -1]
+        if depth > 0:
+            volume += depth * hypervolume(Y[:i + 1, :-1], ref[:-1])
+    return volume
+
+def reference_point(Y):
+    #Reference point as used by TSEMO: worst value of the front plus 1 % of its range
+    front = Y[pareto_mask(Y)]
+    return np.max(front, axis = 0) + 0.01 * (np.max(front, axis = 0) - np.min(front, axis = 0))
+
+def select_max_hvi(Y, candidates, num_experiments = 1, ref = None, cost = None):
+    '''
+    Greedy batch selection by hypervolume improvement (the TSEMO selection step).
+    Each selected candidate is added to the front before the next one is chosen.
+
+    :param Y: observed objectives (n x m), minimisation
+    :param candidates: predicted objectives of the candidates (k x m), minimisation
+    :param cost: optional cost of every candidate, selects by hypervolume improvement per unit cost instead
+    :return: indices of the selected candidates and their hypervolume improvements
+    '''
+    Y = np.atleast_2d(Y)
+    ref = reference_point(Y) if ref is None else ref
+    available = np.ones(candidates.shape[0], dtype = bool)
+    indices, improvements = [], []
+    for _ in range(min(num_experiments, candidates.shape[0])):
+        base = hypervolume(Y, ref)
+        hvi = np.full(candidates.shape[0], -np.inf)
+        for k in np.flatnonzero(available):
+            hvi[k] = hypervolume(np.vstack([Y, candidates[k]]), ref) - base
+        if cost is None:
+            best = int(np.argmax(hvi))
+        elif np.max(hvi) > 0:
+            best = int(np.argmax(np.where(available, hvi / cost, -np.inf)))
+        else:
+            # no candidate improves the front, take the best one under the sample
+            best = int(np.argmin(np.where(available, candidates.sum(axis = 1), np.inf)))
+        indices.append(best)
+        improvements.append(float(hvi[best]))
+        available[best] = False
+        Y = np.vstack([Y, candidates[best]])
+    return indices, improvements
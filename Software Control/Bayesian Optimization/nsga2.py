@@ -0,0 +1,94 @@
+import numpy as np
+
+# NSGA-II (Deb et al. 2002) on the unit hypercube with SBX crossover and polynomial mutation,
+# the same operators pymoo uses inside summit's TSEMO.
+ETA_CROSSOVER = 15
+ETA_MUTATION = 20
+P_CROSSOVER = 0.9
+
+
+def non_dominated_ranks(F):
+    #Front index of every row of F (0 = non-dominated)
+    n = F.shape[0]
+    dominates = np.all(F[:, None, :] <= F[None, :, :], axis = 2) & np.any(F[:, None, :] < F[None, :, :], axis = 2)
+    n_dominators = dominates.sum(axis = 0)
+    ranks = np.full(n, -1)
+    front = np.flatnonzero(n_dominators == 0)
+    rank = 0
+    while front.size > 0:
+        ranks[front] = rank
+        n_dominators = n_dominators - dominates[front].sum(axis = 0)
+        n_dominators[ranks >= 0] = -1
+        front = np.flatnonzero(n_dominators == 0)
+        rank += 1
+    return ranks
+
+def crowding_distance(F):
+    n, m = F.shape
+    distance = np.zeros(n)
+    if n <= 2:
+        return np.full(n, np.inf)
+    for j in range(m):
+        order = np.argsort(F[:, j])
+        span = F[order[-1], j] - F[order[0], j]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        if span > 0:
+            distance[order[1:-1]] += (F[order[2:], j] - F[order[:-2], j]) / span
+    return distance
+
+def _survival(F, n_survivors):
+    ranks = non_dominated_ranks(F)
+    crowding = np.zeros(F.shape[0])
+    for r in np.unique(ranks):
+        members = np.flatnonzero(ranks == r)
+        crowding[members] = crowding_distance(F[members])
+    order = np.lexsort((-crowding, ranks))
+    survivors = order[:n_survivors]
+    return survivors, ranks[survivors], crowding[survivors]
+
+def _tournament(ranks, crowding, n, rng):
+    a = rng.integers(0, ranks.size, n)
+    b = rng.integers(0, ranks.size, n)
+    a_wins = (ranks[a] < ranks[b]) | ((ranks[a] == ranks[b]) & (crowding[a] >= crowding[b]))
+    return np.where(a_wins, a, b)
+
+def _sbx(P1, P2, rng):
+    u = rng.uniform(size = P1.shape)
+    beta = np.where(u <= 0.5, (2 * u)**(1 / (ETA_CROSSOVER + 1)), (1 / (2 * (1 - u)))**(1 / (ETA_CROSSOVER + 1)))
+    cross = (rng.uniform(size = (P1.shape[0], 1)) < P_CROSSOVER) & (rng.uniform(size = P1.shape) < 0.5)
+    C1 = np.where(cross, 0.5 * ((1 + beta) * P1 + (1 - beta) * P2), P1)
+    C2 = np.where(cross, 0.5 * ((1 - beta) * P1 + (1 + beta) * P2), P2)
+    return np.vstack([C1, C2])
+
+def _mutation(X, rng):
+    u = rng.uniform(size = X.shape)
+    delta = np.where(u < 0.5, (2 * u)**(1 / (ETA_MUTATION + 1)) - 1, 1 - (2 * (1 - u))**(1 / (ETA_MUTATION + 1)))
+    mutate = rng.uniform(size = X.shape) < 1.0 / X.shape[1]
+    return np.clip(np.where(mutate, X + delta, X), 0, 1)
+
+def nsga2(evaluate, n_var, pop_size = 100, generations = 100, rng = None, initial = None):
+    '''
+    Minimises the objectives returned by evaluate(X) -> (n x m) over [0,1]^n_var.
+    Returns the non-dominated set of the final population (X, F).
+    '''
+    rng = np.random.default_rng() if rng is None else rng
+    X = rng.uniform(size = (pop_size, n_var))
+    if initial is not None:
+        initial = np.atleast_2d(initial)[:pop_size]
+        X[:initial.shape[0]] = initial
+    F = evaluate(X)
+    survivors, ranks, crowding = _survival(F, pop_size)
+    X, F = X[survivors], F[survivors]
+
+    for _ in range(generations):
+        parents = _tournament(ranks, crowding, pop_size, rng)
+        half = pop_size // 2 + pop_size % 2
+        children = _sbx(X[parents[:half]], X[parents[half:2 * half]] if pop_size > 1 else X[parents[:half]], rng)
+        children = _mutation(children[:pop_size], rng)
+        X = np.vstack([X, children])
+        F = np.vstack([F, evaluate(children)])
+        survivors, ranks, crowding = _survival(F, pop_size)
+        X, F = X[survivors], F[survivors]
+
+    front = ranks == 0
+    return X[front], F[front]
@@ -0,0 +1,239 @@
+'''
+Optimizer as an ask/tell client of the OPC-UA recipe server (Echem Server.py).
+
+ask: the next suggestion is converted into a recipe and published on the server, the typed
+conditions on Optimizer/Conditions and the recipe on LiquidHandler/RecipeSTR, then Start is set
+so that Run.py forms the slug right away.
+tell: the analysis writes the result row (same 13 fields as ynewtrue1.csv) to Optimizer/Result
+and the suggestion id to Optimizer/ResultId, the optimizer stores it and asks for the next one.
+
+    python opcua_optimizer.py run --url opc.tcp://host:4840 --maxiter 60
+    python opcua_optimizer.py bridge --url opc.tcp://host:4840 --file ynewtrue1.csv   # publishes rows still written to a file
+'''
+import os
+import sys
+import asyncio
+import argparse
+import importlib
+from asyncua import Client, ua
+from cost_model import reaction_time
+from discrete import nearest_level
+from results_store import is_failed_row
+# the subscription handler is shared with the recipe server in the parent folder (Software Control)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_changes import DataChanges
+
+# Slug composition, same calculation as recipe_calculation in Run_No_Client.py
+RECIPE_SETTINGS = {
+    'concentration_main_stock_sol': 100,    #mM
+    'concentration_main_in_reaction': 20,   #mM
+    'position_main_reagent': 3,
+    'position_solvent': 1,
+    'slug_volume': 360,                     #uL
+    'reactor_volume': 256,                  #uL passed through the reactor during the reaction, flow = volume / time
+    'voltage': 7,                           #V
+    'reagents': {'RAE': (4, 170), 'Electrolyte': (5, 500)},  #variable with the equivalents: (vial, stock concentration mM)
+    'acid': 'Acid',                         #variable with the equivalents of the acid
+    'acid_vials': {0.25: 6, 0.75: 7},       #vial of the acid selected by acid_type
+    'acid_concentration': 500,              #mM
+}
+
+
+def recipe_from_conditions(conditions, settings = RECIPE_SETTINGS):
+    '''
+    Converts the conditions of a suggestion ({variable name: value}) into the integer recipe read by Run.py:
+    [flow rate (uL/min), reaction time (s), voltage (V), current (mA) * 100, vial, volume (uL), vial, volume, ...]
+    The reaction time passes Charge (F/mol of the main reagent) at the constant Current (mA).
+    '''
+    s = settings
+    time_pumping = float(reaction_time(conditions['Charge'], conditions['Current'], s['concentration_main_in_reaction'], s['slug_volume']))
+    flow_rate = s['reactor_volume'] / (time_pumping / 60)
+
+    volumes = {s['position_main_reagent']: s['concentration_main_in_reaction'] * 415 / s['concentration_main_stock_sol']}
+    for name, (vial, concentration) in s['reagents'].items():
+        volumes[vial] = conditions[name] * s['concentration_main_in_reaction'] * 370 / concentration
+    acid_vial = s['acid_vials'][nearest_acid_type(conditions['acid_type'], s)]
+    volumes[acid_vial] = conditions[s['acid']] * s['concentration_main_in_reaction'] * 370 / s['acid_concentration']
+    volume_solvent = s['slug_volume'] - sum(volumes.values())
+    if volume_solvent < 0:
+        raise ValueError(f"reagent volumes exceed the slug volume by {-volume_solvent:.1f} uL")
+    volumes[s['position_solvent']] = volume_solvent
+
+    recipe = [round(flow_rate), round(time_pumping), round(s['voltage']), round(conditions['Current'] * 100)]
+    for vial, volume in volumes.items():
+        recipe += [int(vial), round(volume)]
+    return recipe
+
+
+def nearest_acid_type(value, settings = RECIPE_SETTINGS):
+    #acid_type level of the acid vial closest to a continuous suggestion
+    return float(nearest_level(value, sorted(settings['acid_vials']))[0])
+
+
+async def get_variables(client):
+    #Variables of the LiquidHandler and Optimizer objects of the recipe server
+    variables = {}
+    for name in ['Start', 'End', 'RecipeSTR', 'Recipe', 'RecipeStatus']:
+        variables[name] = await client.nodes.root.get_child(["0:Objects", "2:LiquidHandler", f"2:{name}"])
+    for name in ['SuggestionId', 'Conditions', 'ConditionNames', 'ResultId', 'Result']:
+        variables[name] = await client.nodes.root.get_child(["0:Objects", "2:Optimizer", f"2:{name}"])
+    return variables
+
+
+class OPCUAOptimizer:
+    '''
+    :param url: endpoint of the recipe server
+    :param optimizer: TSEMO_iteration
+    :param store: ResultsStore of the campaign
+    :param archive: optional ParetoArchive updated with every result
+    '''
+
+    def __init__(self, url, optimizer, store, archive = None, settings = RECIPE_SETTINGS):
+        self.url = url
+        self.optimizer = optimizer
+        self.store = store
+        self.archive = archive
+        self.settings = settings
+        self.inputs = [v.name for v in optimizer.con.getDomain().input_variables]
+        self.suggestion_id = 0
+        self.conditions = None
+        self.client = None
+        self.variables = None
+        self.changes = None
+
+    async def ask(self):
+        #Computes the next suggestion (off the event loop) and publishes it as a recipe
+        loop = asyncio.get_running_loop()
+        from summit import DataSet
+        previous = DataSet.from_df(self.store.fetch_new())
+        line = await loop.run_in_executor(None, self.optimizer.suggest_next, previous, 1)
+        conditions = {name: float(line[name].iloc[0]) for name in self.inputs}
+        # published as run, so the result row reports the acid that was actually used
+        conditions['acid_type'] = nearest_acid_type(conditions['acid_type'], self.settings)
+        recipe = recipe_from_conditions(conditions, self.settings)
+        self.conditions = conditions
+
+        # Run.py only takes a new recipe once it has reset End after the previous slug
+        await self.changes.wait_for('End', lambda value: value == 0)
+        self.suggestion_id += 1
+        await self.variables['Conditions'].write_value(ua.Variant([conditions[n] for n in self.inputs], ua.VariantType.Double))
+        await self.variables['RecipeSTR'].write_value(ua.Variant(','.join(str(v) for v in recipe), ua.VariantType.String))
+        await self.variables['SuggestionId'].write_value(ua.Variant(self.suggestion_id, ua.VariantType.Int32))
+        await self.wait_for_recipe(recipe)
+        await self.variables['Start'].write_value(ua.Variant(1, ua.VariantType.Int64))
+        print(f"Suggestion {self.suggestion_id}: {conditions}")
+        print(f"Recipe: {recipe}")
+        return recipe
+
+    async def wait_for_recipe(self, recipe, timeout = 5):
+        #Waits for the data change of Recipe that publishes the validated RecipeSTR
+        try:
+            await asyncio.wait_for(self.changes.wait_for('Recipe', lambda value: value is not None and list(value) == recipe), timeout)
+        except asyncio.TimeoutError:
+            status = await self.variables['RecipeStatus'].get_value()
+            raise TimeoutError(f"recipe {recipe} was not published by the server ({status})") from None
+
+    def tell(self, row):
+        #Stores a result row of the current suggestion, a row with nan fields or the zero row is a failed experiment
+        if is_failed_row(row):
+            self.store.append_failure([self.conditions[n] for n in self.inputs], raw = ','.join(str(v) for v in row))
+            print(f"Suggestion {self.suggestion_id} failed")
+            return
+        self.store.append(row)
+        print(f"Result {self.suggestion_id}: {row}")
+        if self.archive is not None:
+            values = self.store.row_to_values(row)
+            dominated, hv = self.archive.add([values[name] for name in self.archive.objectives])
+            print(f"Dominated: {dominated}, hypervolume so far: {hv}")
+
+    async def run(self, maxiter = 60):
+        async with Client(url = self.url, timeout = 4) as client:
+            self.client = client
+            self.variables = await get_variables(client)
+            await self.variables['ConditionNames'].write_value(ua.Variant(self.inputs, ua.VariantType.String))
+            self.suggestion_id = await self.variables['SuggestionId'].get_value()
+
+            changes = asyncio.Queue()
+            names = {self.variables[name].nodeid: name for name in ['ResultId', 'End', 'Recipe']}
+            self.changes = DataChanges(changes, names)
+            subscription = await client.create_subscription(100, self.changes)
+            await subscription.subscribe_data_change([self.variables[name] for name in names.values()])
+
+            await self.ask()
+            n = 0
+            while n < maxiter:
+                node, value = await changes.get()
+                if node == self.variables['Recipe']:
+                    # only waited for by wait_for_recipe
+                    continue
+                if node == self.variables['End']:
+                    if value == 1:
+                        # slug done, release Start so Run.py resets End for the next recipe
+                        await self.variables['Start'].write_value(ua.Variant(0, ua.VariantType.Int64))
+                    continue
+                if value != self.suggestion_id:
+                    continue
+                self.tell(await self.variables['Result'].get_value())
+                n += 1
+                if n < maxiter:
+                    await self.ask()
+            await subscription.delete()
+
+
+async def publish_result(url, row, suggestion_id = None):
+    #Writes a result row to the server, for the analysis side (suggestion_id defaults to the current suggestion)
+    async with Client(url = url, timeout = 4) as client:
+        variables = await get_variables(client)
+        if suggestion_id is None:
+            suggestion_id = await variables['SuggestionId'].get_value()
+        await variables['Result'].write_value(ua.Variant([float(v) for v in row], ua.VariantType.Double))
+        await variables['ResultId'].write_value(ua.Variant(suggestion_id, ua.VariantType.Int32))
+
+async def bridge(url, path):
+    #Publishes every row written to the monitor file (ynewtrue1.csv) as the result of the current suggestion
+    from result_watcher import ResultWatcher
+    watcher = ResultWatcher(path, sep = ';', n_fields = 13)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            row = await loop.run_in_executor(None, watcher.wait_for_result)
+            await publish_result(url, row)
+            print(f"Published {row}")
+    finally:
+        watcher.close()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Optimizer on the OPC-UA recipe server')
+    sub = parser.add_subparsers(dest = 'mode', required = True)
+    run = sub.add_parser('run')
+    run.add_argument('--url', required = True)
+    run.add_argument('--constraints', default = 'constraints')
+    run.add_argument('--results', default = 'results.csv')
+    run.add_argument('--maxiter', type = int, default = 60)
+    run.add_argument('--refit-every', type = int, default = 5)
+    link = sub.add_parser('bridge')
+    link.add_argument('--url', required = True)
+    link.add_argument('--file', default = 'ynewtrue1.csv')
+    args = parser.parse_args(argv)
+
+    if args.mode == 'bridge':
+        asyncio.run(bridge(args.url, args.file))
+        return 0
+
+    import TSEMO_iter
+    from results_store import ResultsStore
+    from pareto_archive import ParetoArchive
+    con = importlib.import_module(args.constraints).constraints()
+    store = ResultsStore(args.results.replace('.csv', '.sqlite'), con)
+    store.import_csv(args.results)
+    archive = ParetoArchive.from_domain(con.getDomain())
+    archive.extend(store.fetch_all()[archive.objectives].to_numpy())
+    optimizer = TSEMO_iter.TSEMO_iteration(con = con, incremental = True, refit_every = args.refit_every)
+    try:
+        asyncio.run(OPCUAOptimizer(args.url, optimizer, store, archive).run(args.maxiter))
+    finally:
+        store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
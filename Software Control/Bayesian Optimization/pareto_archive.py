@@ -0,0 +1,107 @@
+import bisect
+import numpy as np
+from hypervolume import hypervolume
+
+
+class ParetoArchive:
+    '''
+    Pareto front of a campaign with its hypervolume, updated result by result.
+
+    Two objectives: the front is kept sorted by the first objective, so the dominance check is a
+    binary search and the hypervolume gain is swept over the points the new one replaces only.
+    More objectives: the gain is the exclusive contribution of the new point (WFG), the hypervolume
+    of the front limited to the new point, which depends on the size of the front and not of the history.
+
+    :param ref: reference point in the units of the objectives, every objective has to be better than it to count
+    :param maximize: list of booleans, one per objective (all minimised if not given)
+    '''
+
+    def __init__(self, ref, maximize = None):
+        ref = np.asarray(ref, dtype = float)
+        self.sign = np.ones(ref.size) if maximize is None else np.where(maximize, -1.0, 1.0)
+        self.ref = ref * self.sign
+        self.m = ref.size
+        self.objectives = None
+        self.hypervolume = 0.0
+        self.history = []
+        self.xs, self.ys = [], []        # two objectives: front sorted by the first one
+        self.points = np.zeros((0, self.m))
+
+    @classmethod
+    def from_domain(cls, domain, ref = None):
+        #Archive over the objectives of a summit domain, the reference point defaults to the worst bound of every objective
+        outputs = domain.output_variables
+        maximize = [v.maximize for v in outputs]
+        if ref is None:
+            ref = [v.bounds[0] if v.maximize else v.bounds[1] for v in outputs]
+        archive = cls(ref, maximize)
+        archive.objectives = [v.name for v in outputs]
+        return archive
+
+    def __len__(self):
+        return len(self.history)
+
+    @property
+    def front(self):
+        #Non-dominated points in the units of the objectives
+        if self.m == 2:
+            return np.column_stack([self.xs, self.ys]) * self.sign
+        return self.points * self.sign
+
+    def add(self, y):
+        '''
+        Adds one result (objective values) and returns (dominated, hypervolume so far).
+        dominated is True if an earlier result is at least as good in every objective.
+        '''
+        y = np.asarray(y, dtype = float).ravel() * self.sign
+        if not np.all(np.isfinite(y)):
+            dominated = True
+        elif self.m == 2:
+            dominated = self._add_2d(y[0], y[1])
+        else:
+            dominated = self._add_nd(y)
+        self.history.append(self.hypervolume)
+        return dominated, self.hypervolume
+
+    def extend(self, Y):
+        #Adds results row by row, returns the dominated flags
+        return [self.add(y)[0] for y in np.atleast_2d(Y)]
+
+    def _add_2d(self, x, y):
+        xs, ys = self.xs, self.ys
+        i = bisect.bisect_left(xs, x)
+        # the front point with the largest first objective < x has the smallest second objective of those,
+        # a front point with the same first objective is at i
+        if i > 0 and ys[i - 1] <= y:
+            return True
+        if i < len(xs) and xs[i] == x and ys[i] <= y:
+            return True
+        # points replaced by the new one: first objective >= x and second objective >= y (contiguous from i)
+        j = i
+        while j < len(xs) and ys[j] >= y:
+            j += 1
+        if x < self.ref[0] and y < self.ref[1]:
+            top = ys[i - 1] if i > 0 else self.ref[1]
+            right = min(xs[j], self.ref[0]) if j < len(xs) else self.ref[0]
+            # area gained between x and the next remaining point, stepping down along the replaced ones
+            gain, level, position = 0.0, min(top, self.ref[1]), x
+            for k in range(i, j):
+                end = min(xs[k], right)
+                gain += (end - position) * (level - y)
+                position, level = end, min(ys[k], self.ref[1])
+            gain += (right - position) * (level - y)
+            self.hypervolume += gain
+        xs[i:j] = [x]
+        ys[i:j] = [y]
+        return False
+
+    def _add_nd(self, y):
+        P = self.points
+        if P.shape[0] > 0 and np.any(np.all(P <= y, axis = 1)):
+            return True
+        if np.all(y < self.ref):
+            limited = np.maximum(P, y)
+            self.hypervolume += float(np.prod(self.ref - y)) - hypervolume(limited, self.ref)
+        keep = ~np.all(y <= P, axis = 1)
+        self.points = np.vstack([P[keep], y])
+        return False
@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from results_store import INPUT_OFFSET
+
+
+def load_campaigns(paths, con, sep = ','):
+    '''
+    Results of earlier campaigns on the same domain, to warm start the GPs of a new one.
+    Accepts results csv files (raw platform rows, objectives first and conditions from INPUT_OFFSET on)
+    and ResultsStore sqlite files. Failed experiments (all zero or missing values) are left out.
+
+    :param paths: list of files
+    :param con: constraints object of the new campaign (defines the column names)
+    :return: DataFrame with one column per domain variable and a campaign column (file name)
+    '''
+    domain = con.getDomain()
+    objectives = [v.name for v in domain.output_variables]
+    inputs = [c for c in con.getCols() if c not in objectives]
+    frames = []
+    for path in paths:
+        if path.endswith('.sqlite'):
+            frame = _read_store(path, objectives + inputs)
+        else:
+            frame = _read_rows(path, sep, objectives, inputs)
+        frame = frame.dropna()
+        frame['campaign'] = os.path.basename(path)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns = objectives + inputs + ['campaign'])
+    return pd.concat(frames, ignore_index = True)
+
+def _read_rows(path, sep, objectives, inputs):
+    rows = pd.read_csv(path, sep = sep, header = None).to_numpy(dtype = float)
+    width = INPUT_OFFSET + len(inputs)
+    if rows.shape[1] < width:
+        rows = np.hstack([rows, np.full((rows.shape[0], width - rows.shape[1]), np.nan)])
+    # the platform writes zeros when an analysis fails
+    rows = rows[~np.all(rows == 0, axis = 1)]
+    values = np.hstack([rows[:, :len(objectives)], rows[:, INPUT_OFFSET:width]])
+    return pd.DataFrame(values, columns = objectives + inputs)
+
+def _read_store(path, columns):
+    #Read-only, a finished campaign's store is not migrated or locked
+    db = sqlite3.connect(f'file:{path}?mode=ro', uri = True)
+    try:
+        existing = [r[1] for r in db.execute('PRAGMA table_info(results)')]
+        where = 'WHERE feasible = 1' if 'feasible' in existing else ''
+        quoted = ', '.join(f'"{c}"' for c in columns)
+        rows = db.execute(f'SELECT {quoted} FROM results {where} ORDER BY id').fetchall()
+    finally:
+        db.close()
+    return pd.DataFrame(rows, columns = columns, dtype = float)
@@ -0,0 +1,204 @@
+'''
+Seeded replicate campaigns on a process pool, for robustness studies of the optimizer settings.
+
+Every replicate runs a whole campaign (campaign_simulator.run_script_campaign) against a simulated
+objective or an emulator of a historical campaign, with its own seed for random, numpy, torch,
+the optimizer and the measurement noise. The campaign is driven through TSEMO_iteration with the
+settings of experiment_self-optimization_fixed_seed.py by default (summit's TSEMO on the
+constraints_edu_MO domain, one experiment per fit), --incremental studies the in-repo engine instead.
+The workers are spawned with their BLAS / torch thread count limited, so that n workers x threads
+does not oversubscribe the cores.
+
+    python replicate_campaigns.py --replicates 32 --workers 8 --threads 1 --iterations 30 --output replicates.json
+    python replicate_campaigns.py --objective historical --history results.csv --replicates 16
+'''
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import importlib
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from campaign_simulator import ResponseSurface, run_script_campaign
+import TSEMO_iter
+from gp_surrogate import GPModel
+from results_store import ResultsStore
+
+THREAD_VARIABLES = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'NUMEXPR_NUM_THREADS']
+
+
+class HistoricalSurface:
+    '''
+    Emulator of a finished campaign: GP posterior mean fitted to the recorded results, plus
+    noise with the fitted noise level. Inputs that were not recorded in the history are ignored.
+
+    :param path: results csv (raw platform rows) of the campaign
+    :param con: constraints object of the campaign
+    :param seed: seed of the measurement noise
+    '''
+
+    def __init__(self, path, con, sep = ',', seed = None):
+        store = ResultsStore(':memory:', con)
+        store.import_csv(path, sep = sep)
+        history = store.fetch_all(feasible = True)
+        store.close()
+        # failed experiments have no objectives (zero rows not even conditions), the surface is fitted to the measured ones
+        history = history[history['feasible'] == 1].dropna(subset = store.objectives)
+        if len(history) == 0:
+            raise ValueError(f"{path} has no successful experiments to emulate")
+        dom = con.getDomain()
+        self.bounds = np.array([v.bounds for v in dom.input_variables], dtype = float)
+        self.columns = [k for k, v in enumerate(dom.input_variables) if history[v.name].notna().all()]
+        X = self.scale(history[[v.name for v in dom.input_variables]].to_numpy())
+        self.models, self.mean_y, self.std_y = [], [], []
+        for v in dom.output_variables:
+            y = history[v.name].to_numpy()
+            mean, std = y.mean(), y.std() if y.std() > 0 else 1.0
+            self.models.append(GPModel(len(self.columns)).fit(X, (y - mean) / std, restarts = 3, rng = np.random.default_rng(0)))
+            self.mean_y.append(mean)
+            self.std_y.append(std)
+        self.rng = np.random.default_rng(seed)
+        self.durations = ResponseSurface()
+
+    def scale(self, X):
+        X = np.atleast_2d(np.asarray(X, dtype = float))
+        return ((X - self.bounds[:, 0]) / (self.bounds[:, 1] - self.bounds[:, 0]))[:, self.columns]
+
+    def evaluate(self, X):
+        Z = self.scale(X)
+        outputs = []
+        for model, mean, std in zip(self.models, self.mean_y, self.std_y):
+            f, _ = model.predict(Z)
+            outputs.append(mean + std * (f + np.sqrt(model.noise) * self.rng.standard_normal(f.shape)))
+        return tuple(outputs)
+
+    def duration(self, X):
+        return self.durations.duration(X)
+
+
+def _limit_threads(threads):
+    #Worker initializer, the BLAS variables are already set in the environment the worker was spawned with
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+def make_surface(spec, seed):
+    if spec['objective'] == 'historical':
+        con = importlib.import_module(spec['constraints']).constraints()
+        return HistoricalSurface(spec['history'], con, seed = seed)
+    return ResponseSurface(spec.get('params'), seed = seed)
+
+def replicate(spec, seed):
+    #One seeded campaign, seeded the same way as experiment_self-optimization_fixed_seed.py
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    try:
+        import torch
+        torch.manual_seed(seed)
+    except ImportError:
+        pass
+    start = time.perf_counter()
+    con = importlib.import_module(spec['constraints']).constraints()
+    records = run_script_campaign(make_surface(spec, seed), con, spec['iterations'], spec['initial'],
+                                  spec['batch_size'], seed, **spec['optimizer_kwargs'])
+    return {'seed': seed, 'wall_time': time.perf_counter() - start, 'records': records}
+
+def replicate_seeds(base_seed, n):
+    #Independent seeds for the replicates, reproducible from base_seed
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(base_seed).spawn(n)]
+
+def run_replicates(spec, seeds, workers = None, threads = 1):
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+    saved = {k: os.environ.get(k) for k in THREAD_VARIABLES}
+    os.environ.update({k: str(threads) for k in THREAD_VARIABLES})
+    try:
+        # spawn so that every worker loads BLAS with the thread limit above
+        with ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context('spawn'),
+                                 initializer = _limit_threads, initargs = (threads,)) as pool:
+            futures = [pool.submit(replicate, spec, seed) for seed in seeds]
+            results = []
+            for future in futures:
+                results.append(future.result())
+                print(f"replicate {len(results)}/{len(seeds)} done, best area {results[-1]['records'][-1]['best_area']:.1f}", file = sys.stderr)
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+    return results
+
+def aggregate(results, target = None):
+    #Convergence statistics of the best area so far over the replicates, per iteration
+    best = np.array([[r['best_area'] for r in result['records']] for result in results])
+    optimizer_time = np.array([[r['optimizer_time'] for r in result['records']] for result in results])
+    summary = {
+        'n_replicates': best.shape[0],
+        'best_mean': best.mean(axis = 0).tolist(),
+        'best_std': best.std(axis = 0).tolist(),
+        'best_median': np.median(best, axis = 0).tolist(),
+        'best_q10': np.quantile(best, 0.1, axis = 0).tolist(),
+        'best_q90': np.quantile(best, 0.9, axis = 0).tolist(),
+        'final_best_mean': float(best[:, -1].mean()),
+        'final_best_std': float(best[:, -1].std()),
+        'optimizer_time_mean': float(optimizer_time.mean()),
+    }
+    if target is not None:
+        reached = best >= target
+        hits = [int(np.argmax(row)) for row in reached if row.any()]
+        summary['target'] = target
+        summary['fraction_reached'] = len(hits) / best.shape[0]
+        summary['iterations_to_target_median'] = float(np.median(hits)) if hits else None
+    return summary
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Parallel seeded replicate campaigns')
+    parser.add_argument('--objective', choices = ['simulated', 'historical'], default = 'simulated')
+    parser.add_argument('--history', default = 'results.csv', help = 'results csv emulated with --objective historical')
+    # defaults of experiment_self-optimization_fixed_seed.py, the campaign the study characterises
+    parser.add_argument('--constraints', default = 'constraints_edu_MO', help = 'constraints module of the domain')
+    parser.add_argument('--incremental', action = 'store_true', help = 'in-repo engine instead of summit\'s TSEMO')
+    parser.add_argument('--replicates', type = int, default = 8)
+    parser.add_argument('--workers', type = int, default = None)
+    parser.add_argument('--threads', type = int, default = 1, help = 'BLAS / torch threads per worker')
+    parser.add_argument('--iterations', type = int, default = 30)
+    parser.add_argument('--initial', type = int, default = 5)
+    parser.add_argument('--batch-size', type = int, default = 1)
+    parser.add_argument('--refit-every', type = int, default = 5, help = 'needs --incremental')
+    parser.add_argument('--spectral', type = int, default = 4000)
+    parser.add_argument('--seed', type = int, default = 996)
+    parser.add_argument('--target', type = float, default = None, help = 'area counted as converged')
+    parser.add_argument('--output', default = None)
+    args = parser.parse_args(argv)
+
+    spec = {
+        'objective': args.objective,
+        'history': os.path.abspath(args.history),
+        'constraints': args.constraints,
+        'iterations': args.iterations,
+        'initial': args.initial,
+        'batch_size': args.batch_size,
+        'optimizer_kwargs': {'incremental': args.incremental, 'refit_every': args.refit_every, 'n_spectral_points': args.spectral},
+    }
+    # settings summit's TSEMO would ignore are refused here rather than in every worker
+    TSEMO_iter.check_settings(**spec['optimizer_kwargs'])
+    seeds = replicate_seeds(args.seed, args.replicates)
+    start = time.perf_counter()
+    results = run_replicates(spec, seeds, args.workers, args.threads)
+    report = {'settings': vars(args), 'seeds': seeds, 'wall_time': time.perf_counter() - start,
+              'summary': aggregate(results, args.target), 'replicates': results}
+    text = json.dumps(report, indent = 2)
+    if args.output is None:
+        print(json.dumps(report['summary'], indent = 2))
+    else:
+        with open(args.output, 'w') as output_file:
+            output_file.write(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
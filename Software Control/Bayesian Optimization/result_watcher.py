@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+import math
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _Inotify:
+    #Minimal ctypes binding to inotify, watches the directory so atomic replaces are seen as well
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno = True)
+        self.fd = libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init failed')
+        directory = os.path.dirname(os.path.abspath(path))
+        self.name = os.path.basename(path)
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {directory}')
+
+    def wait(self, timeout):
+        #Blocks until the watched file is touched or timeout (s) expires, returns True on an event
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        buffer = os.read(self.fd, 4096)
+        offset = 0
+        hit = False
+        while offset < len(buffer):
+            _, _, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b'\0').decode(errors = 'replace')
+            offset += length
+            if name == self.name:
+                hit = True
+        return hit
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ResultWatcher:
+    '''
+    Waits for new result rows in the monitor file (ynewtrue1.csv) written by the platform.
+    Uses inotify on Linux and falls back to polling the file signature everywhere else.
+
+    :param path: monitor file
+    :param sep: field separator of the monitor file
+    :param n_fields: number of fields of a complete result row
+    :param debounce: time (s) the file has to stay unchanged before it is read, guards against partial writes
+    :param poll_interval: polling period (s) used when inotify is not available
+    '''
+
+    def __init__(self, path, sep = ';', n_fields = 13, debounce = 0.2, poll_interval = 0.25, use_inotify = True):
+        self.path = path
+        self.sep = sep
+        self.n_fields = n_fields
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.last_signature = self._signature()
+        # signature (mtime, size) of the file when the last row was returned, every later write is a new result,
+        # also one with the same content as the previous row (a repeated failure or zero row)
+        self.result_signature = self.last_signature
+        self.last_content = self._read()
+        self.inotify = None
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                self.inotify = _Inotify(path)
+            except OSError:
+                self.inotify = None
+
+    def wait_for_result(self, timeout = None):
+        '''
+        Blocks until a new complete row is flushed to the monitor file and returns it as a list
+        of floats (non numeric fields become nan). Returns None if timeout (s) expires first.
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            if not self._wait_for_change(remaining):
+                continue
+            self._settle()
+            signature = self.last_signature
+            if signature is None or signature == self.result_signature:
+                # no write since the last row, e.g. the second event of the same write
+                continue
+            content = self._read()
+            if content is None or self._signature() != signature:
+                # written again while reading, read it once that write has settled
+                continue
+            row = self.parse(content)
+            if row is None:
+                # incomplete row, keep waiting for the rest of the write
+                continue
+            self.result_signature = signature
+            self.last_content = content
+            return row
+
+    def parse(self, content):
+        #Returns the last complete row of the file or None if it is not complete yet
+        lines = [l for l in content.replace('\r', '').split('\n') if l.strip()]
+        if len(lines) == 0:
+            return None
+        fields = lines[-1].split(self.sep)
+        if len(fields) < self.n_fields:
+            return None
+        row = []
+        for field in fields[0:self.n_fields]:
+            try:
+                row.append(float(field))
+            except ValueError:
+                row.append(math.nan)
+        return row
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def _wait_for_change(self, timeout):
+        if self.inotify is not None:
+            changed = self.inotify.wait(self.poll_interval if timeout is None else min(timeout, 60))
+            signature = self._signature()
+            if changed or signature != self.last_signature:
+                self.last_signature = signature
+                return True
+            return False
+        time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+        signature = self._signature()
+        if signature != self.last_signature:
+            self.last_signature = signature
+            return True
+        return False
+
+    def _settle(self):
+        #Waits until the file signature stops changing for the debounce period
+        while True:
+            time.sleep(self.debounce)
+            signature = self._signature()
+            if signature == self.last_signature:
+                return
+            self.last_signature = signature
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as monitor_file:
+                return monitor_file.read()
+        except (FileNotFoundError, PermissionError):
+            # the platform may hold the file open for writing on Windows
+            return None
@@ -0,0 +1,143 @@
+import os
+import math
+import time
+import sqlite3
+
+# Layout of a result row as written by the platform to ynewtrue1.csv:
+# the objectives are the leading fields, the conditions of the experiment start at field 7
+INPUT_OFFSET = 7
+
+
+class ResultsStore:
+    '''
+    Append-only SQLite store of experiment results with one named REAL column per domain variable.
+    Appends are a single INSERT and fetch_new only loads the rows added since the last call,
+    so the cost per iteration does not grow with the length of the campaign.
+    Failed experiments are stored with their conditions, no objectives and feasible = 0.
+
+    :param path: sqlite database file
+    :param con: constraints object of the campaign (defines the column names)
+    '''
+
+    def __init__(self, path, con):
+        self.path = path
+        self.columns = con.getCols()
+        objectives = [v.name for v in con.getDomain().output_variables]
+        self.inputs = [c for c in self.columns if c not in objectives]
+        self.objectives = [c for c in self.columns if c in objectives]
+        self.last_id = 0
+
+        self.db = sqlite3.connect(self.path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        variable_columns = ', '.join(f'"{c}" REAL' for c in self.columns)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'created REAL NOT NULL, '
+            f'{variable_columns}, '
+            'raw TEXT, '
+            'feasible INTEGER NOT NULL DEFAULT 1)'
+        )
+        # stores written before the feasibility label
+        existing = [r[1] for r in self.db.execute('PRAGMA table_info(results)')]
+        if 'feasible' not in existing:
+            self.db.execute('ALTER TABLE results ADD COLUMN feasible INTEGER NOT NULL DEFAULT 1')
+        self.db.commit()
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def row_to_values(self, row):
+        #Maps a raw platform row (list of numbers) to {column name: value}
+        values = {}
+        for k, name in enumerate(self.objectives):
+            values[name] = _field(row, k)
+        for k, name in enumerate(self.inputs):
+            values[name] = _field(row, INPUT_OFFSET + k)
+        return values
+
+    def append(self, row, created = None):
+        #Appends one raw platform row, returns its id
+        return self.append_values(self.row_to_values(row), raw = ','.join(str(v) for v in row), created = created)
+
+    def append_failure(self, inputs, raw = None, created = None):
+        #Records a failed experiment at its conditions (input values in domain order, None if unknown)
+        values = {} if inputs is None else dict(zip(self.inputs, inputs))
+        return self.append_values(values, raw = raw, created = created, feasible = False)
+
+    def append_values(self, values, raw = None, created = None, feasible = True):
+        #Appends one result given as {column name: value}, returns its id
+        names = ['created'] + self.columns + ['raw', 'feasible']
+        params = [time.time() if created is None else created] + [values.get(c) for c in self.columns] + [raw, int(feasible)]
+        placeholders = ', '.join('?' for _ in names)
+        quoted = ', '.join(f'"{n}"' for n in names)
+        cursor = self.db.execute(f'INSERT INTO results ({quoted}) VALUES ({placeholders})', params)
+        self.db.commit()
+        return cursor.lastrowid
+
+    def import_csv(self, path, sep = ','):
+        '''
+        Imports a legacy results.csv (raw platform rows, no header) into an empty store, returns the number of rows.
+        A store with results already only checks the csv, which the experiment scripts keep appending to: a row
+        the store does not hold means the csv belongs to another campaign and raises ValueError.
+        Lines that are not numbers are skipped and reported.
+        '''
+        if not os.path.exists(path):
+            return 0
+        rows = []
+        with open(path, 'r') as result_file:
+            for number, line in enumerate(result_file, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append((line, [float(v) for v in line.split(sep)]))
+                except ValueError:
+                    print(f"{path}, line {number} skipped, it is not a result row: {line}")
+        if len(self) > 0:
+            stored = {r[0] for r in self.db.execute('SELECT raw FROM results WHERE raw IS NOT NULL')}
+            missing = sum(line not in stored and ','.join(str(v) for v in row) not in stored for line, row in rows)
+            if missing > 0:
+                raise ValueError(f"{path} has {missing} rows that are not in {self.path}, the store holds another "
+                                 "campaign: move one of them away to start a new campaign")
+            return 0
+        for line, row in rows:
+            if is_failed_row(row):
+                # zero row the experiment loop used to write for a failed experiment, its conditions are lost
+                self.append_failure(None, raw = line)
+            else:
+                self.append(row)
+        return len(rows)
+
+    def fetch_new(self):
+        #Returns the rows appended since the last call as a DataFrame with the domain column names
+        #(failed experiments have no objectives)
+        frame = self._select('WHERE id > ?', (self.last_id,))
+        if len(frame) > 0:
+            self.last_id = int(frame.index[-1])
+        return frame
+
+    def fetch_all(self, created = False, feasible = False):
+        #created = True adds the time (s since epoch) each result was stored, feasible = True the feasibility label
+        return self._select('', (), created, feasible)
+
+    def close(self):
+        self.db.close()
+
+    def _select(self, where, params, created = False, feasible = False):
+        # pandas is imported here so that appending results does not pay for its import
+        import pandas as pd
+        columns = self.columns + ['created'] * created + ['feasible'] * feasible
+        quoted = ', '.join(f'"{c}"' for c in columns)
+        rows = self.db.execute(f'SELECT id, {quoted} FROM results {where} ORDER BY id', params).fetchall()
+        frame = pd.DataFrame([r[1:] for r in rows], columns = columns, index = [r[0] for r in rows], dtype = float)
+        frame.index.name = 'id'
+        return frame
+
+
+def is_failed_row(row):
+    #A result row of a failed experiment: a field that is not a number, or the zero row the experiment loop used to write
+    return any(math.isnan(v) for v in row) or not any(row)
+
+def _field(row, k):
+    return float(row[k]) if k < len(row) else None
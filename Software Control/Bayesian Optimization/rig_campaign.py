@@ -0,0 +1,154 @@
+import TSEMO_iter as TSEMO_iter
+from summit import DataSet
+from suggestion_queue import SuggestionQueue, write_experiment
+from result_watcher import ResultWatcher
+from results_store import ResultsStore, is_failed_row
+from checkpoint import Checkpoint, campaign_config, campaign_state, resume_campaign
+from pareto_archive import ParetoArchive
+from cost_model import CostModel
+from feasibility import FeasibilityModel
+from prior_campaigns import load_campaigns
+from discrete import snap_discrete
+
+
+class RigCampaign:
+    '''
+    Closed loop campaign on the rig shared by the experiment scripts: suggestions are handed to the
+    platform in output_file_path (through the queue file), results are read from monitor_file_path,
+    appended to the results store / results csv / Pareto archive and the campaign is checkpointed
+    after every iteration.
+
+    :param con: constraints object of the campaign
+    :param result_file_path: results csv, the store and the checkpoint are kept next to it
+    :param batch_size: experiments suggested per optimizer fit
+    :param n_columns: input columns of a suggestion written for the platform
+    :param cost_aware: select by hypervolume improvement per hour of rig time (CostModel, needs incremental)
+    :param feasibility_filter: learn where experiments fail and keep such candidates away from the rig (needs incremental)
+    :param prior_campaigns: results (csv files or .sqlite stores) of earlier campaigns to warm start from (needs incremental)
+    :param optimizer_kwargs: settings of TSEMO_iteration (incremental, speculative, workers, ...)
+    '''
+
+    def __init__(self, con, output_file_path = 'xnewtrue1.csv', monitor_file_path = 'ynewtrue1.csv',
+                 result_file_path = 'results.csv', queue_file_path = 'xqueue.csv', batch_size = 1, n_columns = 6,
+                 cost_aware = False, feasibility_filter = False, prior_campaigns = (), prior_noise = 4.0,
+                 **optimizer_kwargs):
+        # settings the optimizer would not use are refused before the store and the models are built
+        TSEMO_iter.check_settings(cost_model = cost_aware or None, feasibility = feasibility_filter or None,
+                                  prior = list(prior_campaigns) or None, **optimizer_kwargs)
+        self.con = con
+        self.output_file_path = output_file_path
+        self.result_file_path = result_file_path
+        self.checkpoint_file_path = result_file_path.replace('.csv', '_checkpoint.json')
+        self.batch_size = batch_size
+        self.n_columns = n_columns
+
+        self.queue = SuggestionQueue(queue_file_path)
+        self.watcher = ResultWatcher(monitor_file_path, sep = ';', n_fields = 13)
+        self.store = ResultsStore(result_file_path.replace('.csv', '.sqlite'), con)
+        # one time migration of an existing results file into the store, a results file of another campaign is refused
+        self.store.import_csv(result_file_path)
+        print(self.store.fetch_all())
+        # Pareto front and hypervolume of the campaign, updated with every new result
+        self.archive = ParetoArchive.from_domain(con.getDomain())
+        self.archive.extend(self.store.fetch_all()[self.archive.objectives].to_numpy())
+        self.feasibility = FeasibilityModel.from_domain(con.getDomain()) if feasibility_filter else None
+        self.cost_model = CostModel([v.name for v in con.getDomain().input_variables]) if cost_aware else None
+        prior = load_campaigns(prior_campaigns, con) if prior_campaigns else None
+        self.optimizer = TSEMO_iter.TSEMO_iteration(con = con, cost_model = self.cost_model, feasibility = self.feasibility,
+                                                    prior = prior, prior_noise = prior_noise, **optimizer_kwargs)
+        self.checkpoint = Checkpoint(self.checkpoint_file_path)
+        # a checkpoint is only resumed by a campaign on the same domain with the same settings (the pool size does
+        # not change the suggestions)
+        self.config = campaign_config(con.getDomain(), batch_size = batch_size, n_columns = n_columns, cost_aware = cost_aware,
+                                      feasibility_filter = feasibility_filter, prior_campaigns = list(prior_campaigns),
+                                      prior_noise = prior_noise,
+                                      **{k: v for k, v in optimizer_kwargs.items() if k not in ('workers', 'executor')})
+
+    def convert_results_to_init(self):
+        #only the results appended since the last fit, the strategy keeps the earlier ones
+        #failed experiments have no objectives, they only inform the feasibility model
+        return DataSet.from_df(self.store.fetch_new().dropna(subset = self.store.objectives))
+
+    def next_experiment(self):
+        if len(self.queue) == 0:
+            if self.cost_model is not None:
+                self.cost_model.fit_store(self.store)
+            if self.feasibility is not None:
+                self.feasibility.fit_store(self.store)
+            previous = self.convert_results_to_init()
+            # discrete inputs (acid_type) are suggested on their levels, snapping only matters for the summit strategy
+            line = snap_discrete(self.optimizer.suggest_next(previous, self.batch_size), self.con.getDomain())
+            print(line[line.data_columns])
+            self.queue.push(line[line.data_columns].iloc[:,0:self.n_columns].to_numpy())
+        row = self.queue.pop()
+        write_experiment(self.output_file_path, row)
+        print(row)
+        print(f"{len(self.queue)} experiments left in queue")
+        if len(self.queue) == 0:
+            self.optimizer.speculate(row, self.batch_size)
+        return row
+
+    def record_result(self, outputs, i, pending):
+        #write results of previous experiment to results file
+        print(outputs)
+        result = ",".join(str(v) for v in outputs) + "\n"
+        if is_failed_row(outputs):
+            # failed experiment (unparsable or zero row), stored as infeasible at the conditions that were sent
+            self.store.append_failure(pending, raw = result)
+            print("Failed experiment recorded")
+        else:
+            self.store.append(outputs)
+            try:
+                with open(self.result_file_path, 'a') as result_file:
+                    result_file.write(result)
+            except OSError as error:
+                # the store holds the result, the csv is a copy for the user
+                print(f"Result not written to {self.result_file_path}: {error}")
+            values = self.store.row_to_values(outputs)
+            dominated, hv = self.archive.add([values[name] for name in self.archive.objectives])
+            print(f"Dominated: {dominated}, hypervolume so far: {hv}")
+
+        print("")
+        print(i)
+        print("Result:")
+        print(result)
+        print("")
+
+    def save_checkpoint(self, i, pending):
+        #i is the loop iteration that receives the result of the pending experiment
+        self.checkpoint.save(campaign_state(i, self.optimizer, self.queue, self.store, self.watcher, pending, self.config))
+
+    def run(self, maxiter):
+        state = self.checkpoint.load()
+        if state is None:
+            # suggestions left in the queue file by an earlier campaign are not served to this one
+            self.queue.clear()
+            start = 0
+            pending = self.next_experiment()
+            self.save_checkpoint(start, pending)
+        else:
+            # resume after a crash: no refit, and the pending experiment is not suggested a second time
+            status, start, outputs = resume_campaign(state, self.optimizer, self.queue, self.store, self.watcher, self.config)
+            pending = state['pending']
+            print(f"Resumed from {self.checkpoint_file_path} at iteration {start} ({status})")
+            if status == 'arrived':
+                self.record_result(outputs, start, pending)
+                start += 1
+            if status != 'waiting':
+                pending = self.next_experiment()
+                self.save_checkpoint(start, pending)
+
+        for i in range(start, maxiter):
+            # Wait for the platform to flush the next complete result row to the monitor file
+            outputs = self.watcher.wait_for_result()
+            self.record_result(outputs, i, pending)
+
+            #suggest new experiment from the new results (or take the next one from the queue)
+            pending = self.next_experiment()
+            self.save_checkpoint(i + 1, pending)
+        # the campaign is finished, the next start of the script begins a new one
+        self.checkpoint.clear()
+        self.queue.clear()
+        self.watcher.close()
+        self.store.close()
+        print("Done")
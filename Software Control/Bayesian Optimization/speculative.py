@@ -0,0 +1,113 @@
+import copy
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class SpeculativeSuggester:
+    '''
+    Computes the next suggestion while the platform is still running the pending experiment.
+
+    The outcome of the pending experiment is fantasized, either with the GP mean (kriging believer)
+    or with the worst observed value of every objective (constant liar). The next suggestion is then
+    computed in a worker from a copy of the engine. When the real result arrives, resolve() returns
+    the precomputed suggestion if the result lies within tolerance predictive standard deviations of
+    the fantasy. Otherwise it refreshes the suggestion from the worker's fitted models, which only
+    costs a rank-one update plus NSGA-II.
+
+    :param engine: TSEMOEngine used for the campaign
+    :param strategy: 'believer' or 'liar'
+    :param tolerance: accepted deviation of the real result from the fantasy (predictive standard deviations)
+    :param executor: 'process' or 'thread' (use 'thread' from scripts without a __main__ guard)
+    '''
+
+    def __init__(self, engine, strategy = 'believer', tolerance = 1.0, executor = 'process'):
+        if strategy not in ('believer', 'liar'):
+            raise ValueError(f"unknown fantasy strategy {strategy}")
+        self.engine = engine
+        self.strategy = strategy
+        self.tolerance = tolerance
+        self.executor = ProcessPoolExecutor(max_workers = 1) if executor == 'process' else ThreadPoolExecutor(max_workers = 1)
+        self.future = None
+        self.num_experiments = 1
+        self.accepted = 0
+        self.refreshed = 0
+
+    @property
+    def pending(self):
+        return self.future is not None
+
+    def start(self, pending, num_experiments = 1):
+        #Starts precomputing the suggestion that follows the pending experiment (list of input values or 2D array)
+        if self.engine.n_data <= 3:
+            # the engine still suggests a space filling design, nothing to precompute
+            return False
+        pending = np.atleast_2d(np.asarray(pending, dtype = float))[:, 0:len(self.engine.inputs)]
+        self.num_experiments = num_experiments
+        self.future = self.executor.submit(speculate, copy.deepcopy(self.engine), pending, self.strategy, num_experiments)
+        return True
+
+    def resolve(self, new_data, num_experiments = None):
+        '''
+        Feeds the real results (DataFrame or DataSet with the domain column names) to the engine and
+        returns the next suggestion, precomputed if the fantasy was close enough.
+        '''
+        num_experiments = self.num_experiments if num_experiments is None else num_experiments
+        try:
+            suggestion, mean, sd, models, state, rng = self.future.result()
+        except Exception as e:
+            print(f"Speculative suggestion failed ({e}), computing it now")
+            self.future = None
+            self.refreshed += 1
+            self.engine.observe(new_data)
+            return self.engine.suggest(num_experiments)
+        self.future = None
+
+        n_before = self.engine.X.shape[0]
+        self.engine.observe(new_data)
+        # take over the models the worker fitted on the data up to the pending experiment
+        self.engine.models = models
+        self.engine.n_fitted, self.engine.fits_since_full = state
+        self.engine.rng = rng
+
+        if self.engine.X.shape[0] == n_before + 1 and num_experiments == self.num_experiments:
+            deviation = np.abs(self.engine.Y[-1] - mean) / sd
+            if np.all(deviation <= self.tolerance):
+                self.accepted += 1
+                self.engine.iterations += 1
+                return suggestion
+        self.refreshed += 1
+        return self.engine.suggest(num_experiments)
+
+    def cancel(self):
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait = False)
+
+
+def speculate(engine, pending, strategy, num_experiments):
+    #Worker: fit, fantasize the pending outcome, suggest from the fantasized data
+    engine.fit()
+    models = copy.deepcopy(engine.models)
+    state = (engine.n_fitted, engine.fits_since_full)
+
+    mean, var = engine.predict(pending)
+    _, _, std = engine.standardized_outputs()
+    noise = np.array([m.noise for m in engine.models]) * std**2
+    sd = np.sqrt(var + noise)
+    if strategy == 'believer':
+        fantasy = mean
+    else:
+        worst = np.where(engine.sign < 0, engine.Y.min(axis = 0), engine.Y.max(axis = 0))
+        fantasy = np.tile(worst, (pending.shape[0], 1))
+
+    frame = pd.DataFrame(pending, columns = engine.inputs)
+    for i, name in enumerate(engine.objectives):
+        frame[name] = fantasy[:, i]
+    engine.observe(frame)
+    suggestion = engine.suggest(num_experiments)
+    return suggestion, mean[-1], sd[-1], models, state, engine.rng
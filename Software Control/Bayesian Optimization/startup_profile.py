@@ -0,0 +1,77 @@
+'''
+Startup profile of the optimizer modules.
+
+Imports every module in a fresh interpreter with python -X importtime and reports the total
+import time and the most expensive modules it pulled in (self and cumulative time).
+
+    python startup_profile.py result_watcher results_store suggestion_queue TSEMO_iter --top 10
+    python startup_profile.py result_watcher --budget 0.5     # exit code 1 if a module takes longer
+'''
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+DEFAULT_MODULES = ['result_watcher', 'results_store', 'suggestion_queue', 'TSEMO_iter', 'tsemo_engine', 'constraints']
+
+
+def profile_module(module):
+    #Returns the -X importtime entries of importing module as (name, self seconds, cumulative seconds)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-W', 'ignore', '-c', f'import {module}'],
+                            capture_output = True, text = True, cwd = os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = [p.strip() for p in line[len('import time:'):].split('|')]
+        entries.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return entries
+
+def summarize(module, entries, top = 10):
+    total = next((c for name, s, c in entries if name == module), sum(s for _, s, _ in entries))
+    # top level packages by cumulative time, e.g. summit, torch, pandas
+    packages = {}
+    for name, s, c in entries:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + s
+    return {
+        'module': module,
+        'total': total,
+        'packages': dict(sorted(packages.items(), key = lambda p: -p[1])[:top]),
+        'slowest': [{'module': n, 'self': s, 'cumulative': c} for n, s, c in sorted(entries, key = lambda e: -e[1])[:top]],
+    }
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Import time per module')
+    parser.add_argument('modules', nargs = '*', default = DEFAULT_MODULES)
+    parser.add_argument('--top', type = int, default = 10)
+    parser.add_argument('--budget', type = float, default = None, help = 'seconds allowed per module')
+    parser.add_argument('--json', action = 'store_true', help = 'print the full report as json')
+    args = parser.parse_args(argv)
+
+    report = []
+    for module in args.modules:
+        try:
+            report.append(summarize(module, profile_module(module), args.top))
+        except ImportError as e:
+            report.append({'module': module, 'total': None, 'error': str(e)})
+
+    if args.json:
+        print(json.dumps(report, indent = 2))
+    else:
+        for entry in report:
+            if entry['total'] is None:
+                print(f"{entry['module']}: import failed ({entry['error']})")
+                continue
+            print(f"{entry['module']}: {entry['total']:.3f} s")
+            for package, seconds in entry['packages'].items():
+                print(f"    {package:<24}{seconds:.3f} s")
+
+    over = [e for e in report if args.budget is not None and (e['total'] is None or e['total'] > args.budget)]
+    return 1 if over else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import os
+
+class SuggestionQueue:
+    '''
+    FIFO of suggested experiments kept in a csv file (one experiment per line, same
+    format as xnewtrue1.csv) so that one optimizer fit can feed several slugs.
+
+    :param path: path of the queue file
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = []
+        if os.path.exists(self.path):
+            self.rows = self._read()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def push(self, rows):
+        #Appends experiments (list of lists or 2D array) to the end of the queue
+        for row in rows:
+            self.rows.append([float(v) for v in row])
+        self._write()
+
+    def pop(self):
+        #Removes and returns the next experiment, None if the queue is empty
+        if len(self.rows) == 0:
+            return None
+        row = self.rows.pop(0)
+        self._write()
+        return row
+
+    def peek(self):
+        return self.rows[0] if len(self.rows) > 0 else None
+
+    def clear(self):
+        self.rows = []
+        self._write()
+
+    def _read(self):
+        rows = []
+        with open(self.path, 'r') as queue_file:
+            for line in queue_file:
+                line = line.strip()
+                if line:
+                    rows.append([float(v) for v in line.split(',')])
+        return rows
+
+    def _write(self):
+        # write to a temporary file first so the platform never reads a half written queue
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as queue_file:
+            for row in self.rows:
+                queue_file.write(format_row(row))
+        os.replace(tmp_path, self.path)
+
+
+def format_row(row):
+    return ','.join(repr(float(v)) for v in row) + '\n'
+
+def write_experiment(path, row):
+    #Writes a single experiment in the xnewtrue1.csv format read by the platform
+    with open(path, 'w') as output_file:
+        output_file.write(format_row(row))
@@ -0,0 +1,93 @@
+import random
+import pytest
+import numpy as np
+import constraints as constraints
+from checkpoint import Checkpoint, campaign_config, campaign_state, resume_campaign
+from result_watcher import ResultWatcher
+from results_store import ResultsStore
+from suggestion_queue import SuggestionQueue
+
+ROW = [120.5, 0, 0, 0, 0, 0, 0, 2.0, 1.5, 2.0, 0.25, 4.0, 6.0]
+
+
+class StubOptimizer:
+    #stands in for TSEMO_iteration, whose summit strategy needs GPy
+    def __init__(self, state = None):
+        self.state = state
+
+    def state_dict(self):
+        return {'engine': self.state}
+
+    def load_state_dict(self, state):
+        self.state = state['engine']
+
+
+def campaign(tmp_path):
+    con = constraints.constraints()
+    store = ResultsStore(str(tmp_path / 'results.sqlite'), con)
+    queue = SuggestionQueue(str(tmp_path / 'xqueue.csv'))
+    monitor = tmp_path / 'ynewtrue1.csv'
+    monitor.write_text('')
+    watcher = ResultWatcher(str(monitor), use_inotify = False)
+    config = campaign_config(con.getDomain(), batch_size = 2, incremental = True)
+    return store, queue, watcher, config
+
+def test_save_and_load_round_trip(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / 'results_checkpoint.json'))
+    assert checkpoint.load() is None
+    checkpoint.save({'iteration': 3, 'pending': [1.0, 2.0]})
+    state = checkpoint.load()
+    assert state['iteration'] == 3 and state['pending'] == [1.0, 2.0]
+    checkpoint.clear()
+    assert checkpoint.load() is None
+
+def test_resume_restores_the_campaign(tmp_path):
+    store, queue, watcher, config = campaign(tmp_path)
+    store.append(ROW)
+    store.fetch_new()
+    queue.push([[1, 2, 3, 0.25, 4, 5]])
+    random.seed(1)
+    np.random.seed(1)
+    checkpoint = Checkpoint(str(tmp_path / 'results_checkpoint.json'))
+    checkpoint.save(campaign_state(4, StubOptimizer({'fits': 7}), queue, store, watcher, [2, 1, 1, 0.75, 3, 6], config))
+    expected = (random.random(), np.random.rand())
+
+    optimizer = StubOptimizer()
+    queue.clear()
+    store.last_id = 0
+    status, iteration, outputs = resume_campaign(checkpoint.load(), optimizer, queue, store, watcher, config)
+    assert (status, iteration, outputs) == ('waiting', 4, None)
+    assert optimizer.state == {'fits': 7}
+    assert queue.rows == [[1.0, 2.0, 3.0, 0.25, 4.0, 5.0]]
+    assert store.last_id == 1
+    assert (random.random(), np.random.rand()) == expected
+    store.close()
+
+def test_resume_finds_a_result_that_arrived(tmp_path):
+    store, queue, watcher, config = campaign(tmp_path)
+    checkpoint = Checkpoint(str(tmp_path / 'results_checkpoint.json'))
+    checkpoint.save(campaign_state(0, StubOptimizer(), queue, store, watcher, [2, 1, 1, 0.75, 3, 6], config))
+    with open(watcher.path, 'w') as monitor_file:
+        monitor_file.write(';'.join(str(v) for v in ROW) + '\n')
+    watcher = ResultWatcher(watcher.path, use_inotify = False)
+    status, iteration, outputs = resume_campaign(checkpoint.load(), StubOptimizer(), queue, store, watcher, config)
+    assert (status, iteration, outputs) == ('arrived', 0, ROW)
+    store.append(outputs)
+    status, iteration, _ = resume_campaign(checkpoint.load(), StubOptimizer(), queue, store, watcher, config)
+    assert (status, iteration) == ('stored', 1)
+    store.close()
+
+def test_resume_refuses_another_config(tmp_path):
+    store, queue, watcher, config = campaign(tmp_path)
+    checkpoint = Checkpoint(str(tmp_path / 'results_checkpoint.json'))
+    checkpoint.save(campaign_state(0, StubOptimizer(), queue, store, watcher, None, config))
+    other = campaign_config(constraints.constraints().getDomain(), batch_size = 1, incremental = True)
+    with pytest.raises(ValueError):
+        resume_campaign(checkpoint.load(), StubOptimizer(), queue, store, watcher, other)
+    store.close()
+
+def test_load_refuses_another_version(tmp_path):
+    path = tmp_path / 'results_checkpoint.json'
+    path.write_text('{"version": 1}')
+    with pytest.raises(ValueError):
+        Checkpoint(str(path)).load()
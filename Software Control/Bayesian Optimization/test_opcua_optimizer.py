@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+import constraints as constraints
+from results_store import ResultsStore
+from pareto_archive import ParetoArchive
+from opcua_optimizer import OPCUAOptimizer
+
+
+def optimizer_client(tmp_path):
+    con = constraints.constraints()
+    store = ResultsStore(str(tmp_path / 'results.sqlite'), con)
+    archive = ParetoArchive.from_domain(con.getDomain())
+    client = OPCUAOptimizer('opc.tcp://localhost:4840', SimpleNamespace(con = con), store, archive)
+    client.conditions = {'RAE': 2.0, 'Acid': 1.5, 'Electrolyte': 2.0, 'acid_type': 0.25, 'Charge': 4.0, 'Current': 6.0}
+    return client
+
+def test_tell_zero_row_is_failure(tmp_path):
+    client = optimizer_client(tmp_path)
+    client.tell([0.0] * 13)
+    frame = client.store.fetch_all(feasible = True)
+    assert len(frame) == 1
+    assert frame['feasible'].iloc[0] == 0
+    assert frame['RAE'].iloc[0] == 2.0
+    assert len(client.archive.front) == 0
+    client.store.close()
+
+def test_tell_result_row(tmp_path):
+    client = optimizer_client(tmp_path)
+    client.tell([120.5, 0, 0, 0, 0, 0, 0, 2.0, 1.5, 2.0, 0.25, 4.0, 6.0])
+    frame = client.store.fetch_all(feasible = True)
+    assert frame['feasible'].iloc[0] == 1
+    assert frame['UHPLC_Area'].iloc[0] == 120.5
+    assert len(client.archive.front) == 1
+    client.store.close()
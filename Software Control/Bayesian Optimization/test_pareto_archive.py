@@ -0,0 +1,56 @@
+import numpy as np
+from pareto_archive import ParetoArchive
+from hypervolume import hypervolume
+
+
+def pareto_mask(Y):
+    #non-dominated rows of Y (minimisation)
+    return np.array([not np.any(np.all(Y <= y, axis = 1) & np.any(Y < y, axis = 1)) for y in Y])
+
+def test_add_reports_dominated_results():
+    archive = ParetoArchive([10, 10])
+    assert archive.add([2, 5]) == (False, 40.0)
+    assert archive.add([5, 2]) == (False, 55.0)
+    dominated, hv = archive.add([6, 6])
+    assert dominated and hv == 55.0
+    assert archive.add([1, 1]) == (False, 81.0)
+    assert archive.front.tolist() == [[1, 1]]
+    assert len(archive) == 4
+
+def test_maximised_objectives_and_reference():
+    archive = ParetoArchive([0, 0], maximize = [True, True])
+    archive.add([4, 1])
+    archive.add([1, 4])
+    _, hv = archive.add([-1, 3])
+    assert hv == 7.0
+    assert sorted(archive.front.tolist()) == [[1, 4], [4, 1]]
+
+def test_hypervolume_matches_batch_computation():
+    rng = np.random.default_rng(0)
+    for m in (2, 3):
+        Y = rng.uniform(size = (60, m))
+        archive = ParetoArchive(np.ones(m))
+        archive.extend(Y)
+        front = Y[pareto_mask(Y)]
+        assert np.isclose(archive.hypervolume, hypervolume(front, np.ones(m)))
+        assert sorted(map(tuple, archive.front)) == sorted(map(tuple, front))
+
+def test_tied_first_objective_replaces_the_worse_point():
+    archive = ParetoArchive([10, 10])
+    archive.add([2, 5])
+    assert archive.add([2, 3]) == (False, 56.0)
+    assert archive.front.tolist() == [[2, 3]]
+    assert archive.add([2, 3])[0]
+    assert archive.add([2, 4])[0]
+    assert archive.front.tolist() == [[2, 3]]
+
+def test_front_with_ties_matches_pareto_mask():
+    rng = np.random.default_rng(1)
+    # integer points along the anti-diagonal, many share their first objective with a front point
+    x = rng.integers(0, 10, 200)
+    Y = np.column_stack([x, 10 - x + rng.integers(0, 3, 200)]).astype(float)
+    archive = ParetoArchive([12, 12])
+    archive.extend(Y)
+    front = np.unique(Y[pareto_mask(Y)], axis = 0)
+    assert sorted(map(tuple, archive.front)) == sorted(map(tuple, front))
+    assert np.isclose(archive.hypervolume, hypervolume(front, np.array([12.0, 12.0])))
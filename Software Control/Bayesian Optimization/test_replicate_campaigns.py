@@ -0,0 +1,49 @@
+import numpy as np
+import constraints as constraints
+from campaign_simulator import ResponseSurface, run_script_campaign
+from replicate_campaigns import HistoricalSurface
+from results_store import INPUT_OFFSET
+
+INPUTS = ['RAE', 'Acid', 'Electrolyte', 'acid_type', 'Charge', 'Current']
+
+
+def write_history(path, n = 12, failure = False, seed = 0):
+    #results csv in the platform layout of the constraints domain: area, 6 unused fields, then the 6 inputs (13 fields)
+    con = constraints.constraints()
+    bounds = np.array([v.bounds for v in con.getDomain().input_variables])
+    rng = np.random.default_rng(seed)
+    X = bounds[:, 0] + rng.uniform(size = (n, len(INPUTS))) * (bounds[:, 1] - bounds[:, 0])
+    X[:, INPUTS.index('acid_type')] = rng.choice([0.25, 0.75], n)
+    area, _ = ResponseSurface().mean(X)
+    with open(path, 'w') as result_file:
+        for x, y in zip(X, area):
+            result_file.write(','.join(str(v) for v in [y] + [0] * (INPUT_OFFSET - 1) + list(x)) + '\n')
+        if failure:
+            # zero row the experiment loop writes for a failed experiment
+            result_file.write(','.join(['0'] * (INPUT_OFFSET + len(INPUTS))) + '\n')
+    return str(path), X, area
+
+def test_history_fixture_fills_every_input(tmp_path):
+    path, X, area = write_history(tmp_path / 'results.csv')
+    surface = HistoricalSurface(path, constraints.constraints(), seed = 0)
+    assert surface.columns == list(range(len(INPUTS)))
+    assert np.isclose(surface.mean_y[0], area.mean())
+
+def test_failed_row_does_not_drop_inputs(tmp_path):
+    con = constraints.constraints()
+    clean_path, _, _ = write_history(tmp_path / 'clean.csv')
+    failed_path, _, area = write_history(tmp_path / 'failed.csv', failure = True)
+    clean = HistoricalSurface(clean_path, con, seed = 0)
+    surface = HistoricalSurface(failed_path, con, seed = 0)
+    assert surface.columns == clean.columns == list(range(len(INPUTS)))
+    assert np.isclose(surface.mean_y[0], area.mean())
+    assert all(np.isfinite(surface.mean_y)) and all(np.isfinite(surface.std_y))
+
+def test_replay_with_failed_row(tmp_path):
+    con = constraints.constraints()
+    path, _, _ = write_history(tmp_path / 'results.csv', failure = True)
+    surface = HistoricalSurface(path, con, seed = 0)
+    # summit's TSEMO needs GPy, the replay is checked on the incremental engine
+    records = run_script_campaign(surface, con, n_iterations = 2, n_initial = 3, seed = 0, incremental = True)
+    assert len(records) == 2
+    assert np.isfinite(records[-1]['best_area'])
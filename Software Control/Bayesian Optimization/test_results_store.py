@@ -0,0 +1,85 @@
+import math
+import pytest
+import constraints as constraints
+from results_store import ResultsStore, is_failed_row
+
+ROW = [120.5, 0, 0, 0, 0, 0, 0, 2.0, 1.5, 2.0, 0.25, 4.0, 6.0]
+
+
+def test_is_failed_row():
+    assert not is_failed_row(ROW)
+    assert is_failed_row([0.0] * 13)
+    assert is_failed_row(ROW[:3] + [math.nan] + ROW[4:])
+    # a zero area with the conditions recorded is a measured result
+    assert not is_failed_row([0.0] + ROW[1:])
+
+def test_append_maps_the_platform_row(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.sqlite'), constraints.constraints())
+    store.append(ROW)
+    frame = store.fetch_all(feasible = True)
+    assert list(frame.columns) == store.columns + ['feasible']
+    assert frame.iloc[0]['UHPLC_Area'] == 120.5
+    assert frame.iloc[0]['RAE'] == 2.0 and frame.iloc[0]['Current'] == 6.0
+    assert frame.iloc[0]['feasible'] == 1
+    store.close()
+
+def test_fetch_new_returns_each_row_once(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.sqlite'), constraints.constraints())
+    store.append(ROW)
+    store.append([130.0] + ROW[1:])
+    assert list(store.fetch_new()['UHPLC_Area']) == [120.5, 130.0]
+    assert len(store.fetch_new()) == 0
+    store.append_failure([1.0, 1.0, 1.0, 0.75, 2.0, 4.0], raw = '0,0')
+    new = store.fetch_new()
+    assert len(new) == 1
+    assert math.isnan(new.iloc[0]['UHPLC_Area']) and new.iloc[0]['RAE'] == 1.0
+    assert len(store) == 3
+    store.close()
+
+def test_fetch_new_continues_after_reopening(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    store = ResultsStore(path, constraints.constraints())
+    store.append(ROW)
+    last_id = store.fetch_new().index[-1]
+    store.close()
+    store = ResultsStore(path, constraints.constraints())
+    store.last_id = int(last_id)
+    store.append([130.0] + ROW[1:])
+    assert list(store.fetch_new()['UHPLC_Area']) == [130.0]
+    store.close()
+
+def test_import_csv_labels_failures(tmp_path):
+    csv_path = tmp_path / 'results.csv'
+    csv_path.write_text(','.join(str(v) for v in ROW) + '\n' + ','.join(['0'] * 13) + '\n')
+    store = ResultsStore(str(tmp_path / 'results.sqlite'), constraints.constraints())
+    assert store.import_csv(str(csv_path)) == 2
+    assert list(store.fetch_all(feasible = True)['feasible']) == [1, 0]
+    # only imported into an empty store
+    assert store.import_csv(str(csv_path)) == 0
+    store.close()
+
+def test_import_csv_refuses_the_csv_of_another_campaign(tmp_path):
+    csv_path = tmp_path / 'results.csv'
+    csv_path.write_text(','.join(str(v) for v in ROW) + '\n')
+    store = ResultsStore(str(tmp_path / 'results.sqlite'), constraints.constraints())
+    store.import_csv(str(csv_path))
+    # rows the experiment scripts append to both the store and the csv
+    row = [130.0] + ROW[1:]
+    store.append(row)
+    with open(csv_path, 'a') as result_file:
+        result_file.write(','.join(str(v) for v in row) + '\n')
+    assert store.import_csv(str(csv_path)) == 0
+    csv_path.write_text(','.join(str(v) for v in [95.0] + ROW[1:]) + '\n')
+    with pytest.raises(ValueError):
+        store.import_csv(str(csv_path))
+    assert len(store) == 2
+    store.close()
+
+def test_import_csv_skips_malformed_lines(tmp_path, capsys):
+    csv_path = tmp_path / 'results.csv'
+    csv_path.write_text('area,purity\n' + ','.join(str(v) for v in ROW) + '\n120.5,n/a\n')
+    store = ResultsStore(str(tmp_path / 'results.sqlite'), constraints.constraints())
+    assert store.import_csv(str(csv_path)) == 1
+    assert 'line 1 skipped' in capsys.readouterr().out
+    assert store.fetch_all().iloc[0]['UHPLC_Area'] == 120.5
+    store.close()
@@ -0,0 +1,26 @@
+from suggestion_queue import SuggestionQueue, write_experiment
+
+
+def test_fifo_order(tmp_path):
+    queue = SuggestionQueue(str(tmp_path / 'xqueue.csv'))
+    assert queue.pop() is None
+    queue.push([[1, 2], [3, 4]])
+    queue.push([[5, 6]])
+    assert len(queue) == 3
+    assert queue.peek() == [1.0, 2.0]
+    assert [queue.pop(), queue.pop(), queue.pop()] == [[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]]
+    assert queue.pop() is None
+
+def test_queue_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'xqueue.csv')
+    queue = SuggestionQueue(path)
+    queue.push([[0.1, 2.5], [3.0, 0.75]])
+    queue.pop()
+    assert SuggestionQueue(path).rows == [[3.0, 0.75]]
+    queue.clear()
+    assert len(SuggestionQueue(path)) == 0
+
+def test_write_experiment_keeps_full_precision(tmp_path):
+    path = tmp_path / 'xnewtrue1.csv'
+    write_experiment(str(path), [0.1 + 0.2, 4])
+    assert path.read_text() == '0.30000000000000004,4.0\n'
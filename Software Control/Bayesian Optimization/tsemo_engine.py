@@ -0,0 +1,336 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from gp_surrogate import GPModel, SparseGPModel
+from nsga2 import nsga2, non_dominated_ranks
+from hypervolume import select_max_hvi
+from discrete import discrete_levels
+
+
+class TSEMOEngine:
+    '''
+    TSEMO (GP per objective -> Thompson sampled functions -> NSGA-II -> max hypervolume improvement)
+    that keeps its GP models between iterations instead of refitting them from scratch every call.
+
+    Refit policy of fit():
+        - every refit_every fits: full hyperparameter optimisation with restarts
+        - exactly one new observation: rank-one update of the Cholesky factor, hyperparameters kept
+        - otherwise: short L-BFGS-B run (warm_maxiter iterations) started from the previous hyperparameters
+
+    :param domain: summit domain (continuous and discrete inputs, objectives), discrete inputs
+        (discrete.DiscreteVariable) are evaluated and suggested on their levels only
+    :param n_spectral_points: number of random Fourier features of the Thompson samples
+    :param generations: NSGA-II generations
+    :param pop_size: NSGA-II population size
+    :param refit_every: iterations between full hyperparameter refits
+    :param warm_maxiter: L-BFGS-B iterations of a warm started refit
+    :param restarts: random restarts of a full refit
+    :param seed: seed of the engine's random generator
+    :param workers: size of the pool that fits and samples the objectives and runs the NSGA-II islands (None = serial)
+    :param executor: 'thread' or 'process' pool
+    :param islands: independent NSGA-II populations of pop_size / islands members, their fronts are merged
+    :param cost_model: optional CostModel, the predicted duration becomes an extra NSGA-II objective and
+        candidates are selected by hypervolume improvement per hour of rig time
+    :param feasibility: optional FeasibilityModel, candidates likely to fail are dropped and the others
+        are weighted with their success probability
+    :param surrogate: 'exact' GPs, or 'sparse' inducing point GPs (SparseGPModel) for merged histories
+        of thousands of results
+    :param n_inducing: inducing points of the sparse GPs
+    '''
+
+    def __init__(self, domain, n_spectral_points = 4000, generations = 100, pop_size = 100,
+                 refit_every = 5, warm_maxiter = 25, restarts = 5, seed = None,
+                 workers = None, executor = 'thread', islands = 1, cost_model = None,
+                 feasibility = None, surrogate = 'exact', n_inducing = 256):
+        if surrogate not in ('exact', 'sparse'):
+            raise ValueError(f"unknown surrogate {surrogate}, expected 'exact' or 'sparse'")
+        self.inputs = [v.name for v in domain.input_variables]
+        self.bounds = np.array([v.bounds for v in domain.input_variables], dtype = float)
+        self.objectives = [v.name for v in domain.output_variables]
+        self.sign = np.array([-1.0 if v.maximize else 1.0 for v in domain.output_variables])
+        # levels of the discrete inputs in scaled units
+        self.levels = {j: self.scale_column(levels, j) for j, levels in discrete_levels(domain).items()}
+
+        self.n_spectral_points = n_spectral_points
+        self.generations = generations
+        self.pop_size = pop_size
+        self.refit_every = refit_every
+        self.warm_maxiter = warm_maxiter
+        self.restarts = restarts
+        self.workers = workers
+        self.executor = executor
+        self.islands = islands
+        self.cost_model = cost_model
+        self.feasibility = feasibility
+        self.surrogate = surrogate
+        self.n_inducing = n_inducing
+        self.pool = None
+        if seed is None:
+            # follow the global numpy seed so seeded scripts stay reproducible
+            seed = np.random.randint(2**31)
+        self.rng = np.random.default_rng(seed)
+
+        self.X = np.zeros((0, len(self.inputs)))
+        self.Y = np.zeros((0, len(self.objectives)))
+        # results of earlier campaigns, used by the GPs with inflated noise but not for the campaign's front
+        self.X_prior = np.zeros((0, len(self.inputs)))
+        self.Y_prior = np.zeros((0, len(self.objectives)))
+        self.prior_noise = 4.0
+        self.models = None
+        self.n_fitted = 0
+        self.fits_since_full = 0
+        self.iterations = 0
+
+    def __getstate__(self):
+        # the pool is not copied to speculative workers or checkpoints
+        state = self.__dict__.copy()
+        state['pool'] = None
+        return state
+
+    def map(self, fn, *iterables):
+        #Runs fn over the arguments serially or on the engine's pool
+        if self.workers is None or self.workers <= 1:
+            return list(map(fn, *iterables))
+        if self.pool is None:
+            pool = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+            self.pool = pool(max_workers = self.workers)
+        return list(self.pool.map(fn, *iterables))
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def seeds(self, n):
+        #Independent seeds for the parallel tasks, drawn from the engine's generator so results do not depend on the pool
+        return [int(s) for s in self.rng.integers(2**63, size = n)]
+
+    def observe(self, data):
+        #Appends new observations (DataFrame or summit DataSet with the domain column names)
+        if data is None or len(data) == 0:
+            return
+        X, Y = self._arrays(data)
+        self.X = np.vstack([self.X, X])
+        self.Y = np.vstack([self.Y, Y])
+
+    def add_prior(self, data, noise_factor = 4.0):
+        '''
+        Adds results of earlier campaigns on the same domain (DataFrame with the domain column names).
+        They enter the GPs with their noise variance multiplied by noise_factor, so the campaign's own
+        results outweigh them where both exist. The next fit is a full refit.
+        '''
+        if data is None or len(data) == 0:
+            return
+        X, Y = self._arrays(data)
+        self.X_prior = np.vstack([self.X_prior, X])
+        self.Y_prior = np.vstack([self.Y_prior, Y])
+        self.prior_noise = noise_factor
+        self.models = None
+
+    def new_model(self):
+        if self.surrogate == 'sparse':
+            return SparseGPModel(len(self.inputs), self.n_inducing)
+        return GPModel(len(self.inputs))
+
+    @property
+    def n_data(self):
+        return self.X.shape[0] + self.X_prior.shape[0]
+
+    def _arrays(self, data):
+        #Scaled inputs and objectives of the complete rows of data
+        X = np.column_stack([_column(data, name) for name in self.inputs])
+        Y = np.column_stack([_column(data, name) for name in self.objectives])
+        keep = np.all(np.isfinite(X), axis = 1) & np.all(np.isfinite(Y), axis = 1)
+        return self.scale(X[keep]), Y[keep]
+
+    def scale(self, X):
+        return (X - self.bounds[:, 0]) / (self.bounds[:, 1] - self.bounds[:, 0])
+
+    def unscale(self, X):
+        return self.bounds[:, 0] + X * (self.bounds[:, 1] - self.bounds[:, 0])
+
+    def scale_column(self, values, j):
+        return (np.asarray(values, dtype = float) - self.bounds[j, 0]) / (self.bounds[j, 1] - self.bounds[j, 0])
+
+    def standardized_outputs(self):
+        #Objectives of the campaign standardised (statistics of all data, prior campaigns included) and oriented for minimisation
+        Y = np.vstack([self.Y_prior, self.Y])
+        mean = Y.mean(axis = 0)
+        std = Y.std(axis = 0)
+        std[std < 1e-5] = 1e-5
+        return (self.Y - mean) / std * self.sign, mean, std
+
+    def training_data(self):
+        #Inputs, standardised objectives and noise factors the GPs are fitted to (prior campaigns first)
+        Ys, mean, std = self.standardized_outputs()
+        Yp = (self.Y_prior - mean) / std * self.sign
+        factors = np.concatenate([np.full(self.X_prior.shape[0], self.prior_noise), np.ones(self.X.shape[0])])
+        return np.vstack([self.X_prior, self.X]), np.vstack([Yp, Ys]), factors
+
+    def fit(self):
+        #Stage 1: brings the GP models up to date with the observations
+        X, Ys, factors = self.training_data()
+        n_new = self.X.shape[0] - self.n_fitted
+        if self.models is None:
+            self.models = [self.new_model() for _ in self.objectives]
+            full = True
+        elif n_new == 0:
+            return 'unchanged'
+        else:
+            full = self.fits_since_full + 1 >= self.refit_every
+
+        if full or n_new > 1:
+            options = {'restarts': self.restarts} if full else {'maxiter': self.warm_maxiter}
+            options['noise_factors'] = factors
+            self.models = self.map(_fit_model, self.models, [X] * len(self.models), list(Ys.T),
+                                   [options] * len(self.models), self.seeds(len(self.models)))
+        else:
+            for i, model in enumerate(self.models):
+                model.add_point(self.X[-1], Ys[:, i])
+        self.n_fitted = self.X.shape[0]
+        self.fits_since_full = 0 if full else self.fits_since_full + 1
+        return 'full' if full else ('rank-one' if n_new == 1 else 'warm')
+
+    def predict(self, X, chunk_size = 4096):
+        '''
+        Posterior mean and variance of every objective at the (unscaled) inputs X, in original units.
+        X is evaluated in blocks of chunk_size rows, the memory is chunk_size x number of results.
+        '''
+        self.fit()
+        Xs = self.scale(np.atleast_2d(np.asarray(X, dtype = float)))
+        _, mean, std = self.standardized_outputs()
+        means = np.zeros((Xs.shape[0], len(self.objectives)))
+        variances = np.zeros_like(means)
+        for start in range(0, Xs.shape[0], chunk_size):
+            block = slice(start, start + chunk_size)
+            for i, model in enumerate(self.models):
+                mu, var = model.predict(Xs[block])
+                means[block, i] = mu * self.sign[i] * std[i] + mean[i]
+                variances[block, i] = var * std[i]**2
+        return means, variances
+
+    def sample(self):
+        #Stage 2: one Thompson sampled function per objective
+        return self.map(_sample_model, self.models, [self.n_spectral_points] * len(self.models), self.seeds(len(self.models)))
+
+    def optimise(self, samples):
+        #Stage 3: NSGA-II on the sampled functions, returns candidate inputs (scaled) and their predicted objectives
+        pop_size = max(self.pop_size // self.islands, 20)
+        if self.cost_model is not None:
+            samples = samples + [_Hours(self.cost_model, self.bounds)]
+        fronts = self.map(_island, [samples] * self.islands, [len(self.inputs)] * self.islands, [pop_size] * self.islands,
+                          [self.generations] * self.islands, self.seeds(self.islands), [self.levels] * self.islands)
+        X = np.vstack([f[0] for f in fronts])
+        F = np.vstack([f[1] for f in fronts])
+        if self.islands > 1:
+            front = non_dominated_ranks(F) == 0
+            X, F = X[front], F[front]
+        return X, F
+
+    def select(self, X, F, num_experiments = 1):
+        #Stage 4: greedy max hypervolume improvement over the observed front
+        Ys, _, _ = self.standardized_outputs()
+        if Ys.shape[0] == 0:
+            # first suggestion of a campaign started from prior results only
+            Ys = self.training_data()[1]
+        m = len(self.objectives)
+        cost = F[:, m] if self.cost_model is not None else None
+        if self.feasibility is not None and self.feasibility.fitted:
+            p_fail = self.feasibility.predict_failure(self.unscale(X))
+            keep = p_fail <= self.feasibility.max_failure
+            if np.any(keep):
+                X, F, p_fail = X[keep], F[keep], p_fail[keep]
+                cost = None if cost is None else cost[keep]
+            # expected cost of a successful experiment
+            cost = (1.0 if cost is None else cost) / np.maximum(1 - p_fail, 1e-3)
+        indices, _ = select_max_hvi(Ys, F[:, :m], num_experiments, cost = cost)
+        return X[indices], F[indices, :m]
+
+    def suggest(self, num_experiments = 1):
+        #Returns a DataFrame with the suggested inputs and the sampled objective values
+        self.iterations += 1
+        if self.n_data <= 3:
+            return self.to_frame(self.latin_hypercube(max(num_experiments, 2)), None)
+        self.fit()
+        X, F = self.optimise(self.sample())
+        X, F = self.select(X, F, num_experiments)
+        return self.to_frame(X, F)
+
+    def state_dict(self):
+        #Observations, models, refit counters and random generator state, json serialisable
+        return {
+            'X': self.X.tolist(),
+            'Y': self.Y.tolist(),
+            'X_prior': self.X_prior.tolist(),
+            'Y_prior': self.Y_prior.tolist(),
+            'prior_noise': self.prior_noise,
+            'models': None if self.models is None else [m.state_dict() for m in self.models],
+            'n_fitted': self.n_fitted,
+            'fits_since_full': self.fits_since_full,
+            'iterations': self.iterations,
+            'rng': self.rng.bit_generator.state,
+        }
+
+    def load_state_dict(self, state):
+        self.X = np.asarray(state['X'], dtype = float).reshape(-1, len(self.inputs))
+        self.Y = np.asarray(state['Y'], dtype = float).reshape(-1, len(self.objectives))
+        self.X_prior = np.asarray(state.get('X_prior', []), dtype = float).reshape(-1, len(self.inputs))
+        self.Y_prior = np.asarray(state.get('Y_prior', []), dtype = float).reshape(-1, len(self.objectives))
+        self.prior_noise = state.get('prior_noise', 4.0)
+        self.models = None
+        if state['models'] is not None:
+            self.models = [self.new_model().load_state_dict(m) for m in state['models']]
+        self.n_fitted = state['n_fitted']
+        self.fits_since_full = state['fits_since_full']
+        self.iterations = state['iterations']
+        self.rng.bit_generator.state = state['rng']
+        return self
+
+    def latin_hypercube(self, n):
+        cut = (np.arange(n)[:, None] + self.rng.uniform(size = (n, len(self.inputs)))) / n
+        for j in range(cut.shape[1]):
+            cut[:, j] = self.rng.permutation(cut[:, j])
+        return _snap(cut, self.levels)
+
+    def to_frame(self, X, F):
+        frame = pd.DataFrame(self.unscale(X), columns = self.inputs)
+        if F is not None:
+            _, mean, std = self.standardized_outputs()
+            F = F * self.sign * std + mean
+            for i, name in enumerate(self.objectives):
+                frame[name] = F[:, i]
+        return frame
+
+
+class _Hours:
+    #Predicted hours of rig time as a function of the scaled inputs, evaluated next to the sampled objectives
+    def __init__(self, cost_model, bounds):
+        self.cost_model = cost_model
+        self.bounds = bounds
+
+    def __call__(self, X):
+        return self.cost_model.predict_hours(self.bounds[:, 0] + np.atleast_2d(X) * (self.bounds[:, 1] - self.bounds[:, 0]))
+
+def _fit_model(model, X, y, options, seed):
+    return model.fit(X, y, rng = np.random.default_rng(seed), **options)
+
+def _sample_model(model, n_features, seed):
+    return model.sample_path(n_features, np.random.default_rng(seed))
+
+def _island(samples, n_var, pop_size, generations, seed, levels = None):
+    # discrete inputs are moved onto their levels before every evaluation, so the sampled functions
+    # are optimised over the values that can be run and the front holds runnable candidates only
+    evaluate = lambda X: np.column_stack([f(_snap(X, levels)) for f in samples])
+    X, F = nsga2(evaluate, n_var, pop_size, generations, np.random.default_rng(seed))
+    return _snap(X, levels), F
+
+def _snap(X, levels):
+    if not levels:
+        return X
+    X = X.copy()
+    for j, values in levels.items():
+        X[:, j] = values[np.argmin(np.abs(X[:, j, None] - values[None, :]), axis = 1)]
+    return X
+
+def _column(data, name):
+    return np.asarray(data[name], dtype = float).ravel()
@@ -1,14 +1,25 @@
+import os
+import sys
 import asyncio
-import numpy as np
 from loguru import logger
 from LHProtocol.gsioc import GSIOCProtocol
 import devices.VERITYPump
 import devices.LiquidHandler
 import Procedures
-from asyncua import Client
+from asyncua import Client, ua
 from devices import Asia_syringe_pump
+# the subscription handler is shared with the recipe server in the parent folder (Software Control)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_changes import DataChanges
+# pooled sessions of the Asia devices, imported under the same name as in devices/Asia_syringe_pump.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'devices'))
+from opcua_session import close_sessions
 
 port = 'COM3'
+# Pull recipes from the job queue of the server (SubmitRecipe / ClaimJob) instead of the Start/End handshake
+use_job_queue = False
+# Publishing interval (ms) of the subscriptions to the server's variables
+subscription_period = 100
 
 'This file allows to perform automated experiments by reading the experimental conditions from a server'
 
@@ -39,34 +50,78 @@ async def run_client(ports):
         RecipeVar = await client.nodes.root.get_child(
         ["0:Objects", "2:LiquidHandler", "2:Recipe"])
         print(await UptimeVar.get_value())
-        await run_closed_loop(StartVar, EndVar, RecipeVar, ports)
+        if use_job_queue:
+            await run_job_queue(client, ports)
+        else:
+            await run_closed_loop(client, StartVar, EndVar, RecipeVar, ports)
 
     except Exception as e:
         print(e)
         return
-
-async def run_closed_loop(StartVar, EndVar, RecipeVar, ports):
-    Start = 0
-    End = 0
+    finally:
+        # shut down the sessions of the Asia devices and their keep-alive tasks
+        await close_sessions()
+
+async def run_closed_loop(client, StartVar, EndVar, RecipeVar, ports, period = None):
+    #Start/End handshake driven by data change notifications, the slug starts as soon as Start is set
+    #with the recipe of the notifications (the server publishes Recipe before the optimizer sets Start)
+    period = subscription_period if period is None else period
+    names = {StartVar.nodeid: 'Start', EndVar.nodeid: 'End', RecipeVar.nodeid: 'Recipe'}
+    changes = asyncio.Queue()
+    subscription = await client.create_subscription(period, DataChanges(changes))
+    await subscription.subscribe_data_change([StartVar, EndVar, RecipeVar])
+    values = {}
     print("Loop Started")
+    try:
+        while True:
+            node, value = await changes.get()
+            values[names[node.nodeid]] = value
+            # the notifications of one publish are applied together before acting on them
+            while not changes.empty():
+                node, value = changes.get_nowait()
+                values[names[node.nodeid]] = value
+            if len(values) < len(names):
+                continue
+            Start, End = values['Start'], values['End']
+            print(Start)
+            print(End)
+
+            if (Start == 1) and (End == 0):
+                Recipe = values['Recipe']
+                print(Recipe)
+                await runSlug(ports, Recipe, EndVar)
+                # End = 1 was written by runSlug, its notification may still be on the way
+                values['End'] = 1
+
+            elif (Start == 0) and (End == 1):
+                await EndVar.write_value(0)
+                values['End'] = 0
+    finally:
+        await subscription.delete()
+
+async def run_job_queue(client, ports):
+    #Runs the jobs of the server's queue one after the other, waits for submissions when it is empty
+    Jobs = await client.nodes.root.get_child(["0:Objects", "2:JobQueue"])
+    QueueLengthVar = await Jobs.get_child("2:QueueLength")
+    submitted = asyncio.Queue()
+    subscription = await client.create_subscription(subscription_period, DataChanges(submitted))
+    await subscription.subscribe_data_change(QueueLengthVar)
+    print("Job Queue Loop Started")
     while True:
-        Start = await StartVar.get_value()
-        End = await EndVar.get_value()
-        print(Start)
-        print(End)
-        await asyncio.sleep(1)
-
-        if (Start == 1) and (End == 0):
-            await asyncio.sleep(2)
-            Recipe = await RecipeVar.get_value()
-            print(Recipe)
-            await runSlug(ports, Recipe, EndVar)
-            await EndVar.write_value(1)
-
-        if (Start == 0) and (End == 1):
-            await EndVar.write_value(0)
-
-async def runSlug(ports, Recipe, EndVar):
+        job_id, Recipe = await Jobs.call_method("2:ClaimJob")
+        if job_id == 0:
+            await submitted.get()
+            continue
+        logger.info(f"job {job_id}: {Recipe}")
+        job_id = ua.Variant(job_id, ua.VariantType.Int32)
+        try:
+            await runSlug(ports, Recipe)
+        except Exception:
+            await Jobs.call_method("2:CompleteJob", job_id, False)
+            raise
+        await Jobs.call_method("2:CompleteJob", job_id, True)
+
+async def runSlug(ports, Recipe, EndVar = None):
     proc = Procedures.ProcedureObject(ports)
     logger.info("start")
            
@@ -103,7 +158,8 @@ async def runSlug(ports, Recipe, EndVar):
     await Asia_syringe_pump.main(1000,0,14.5) #transfer slug from sample loop to reactor
     await proc.Perform_Reaction (flow_rate, time_pumping, voltage, current)
     
-    await EndVar.write_value(1)
+    if EndVar is not None:
+        await EndVar.write_value(1)
     # print(Recipe)
     logger.info("done")
    
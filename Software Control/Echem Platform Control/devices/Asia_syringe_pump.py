@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
+import os
+import sys
 import asyncio
-from asyncua import Client, ua
+from asyncua import ua
 from loguru import logger
-import sys
 import numpy as np
+# the shared sessions are next to this file, imported by path so that the module also runs as a script
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from opcua_session import get_session, ASIA_URL
 
 __all__ = ['Pump']
 
@@ -168,43 +172,35 @@ class Pump(State):
 
 ######## TESTING SECTION #########
 
-async def main(flow_rate_A, flow_rate_B, time_pumping):
-    # ----------- Defining url of OPCUA and flowRate levels -----------
-    # url = "opc.tcp://rcpeno00472:5000/" #OPC Server on RCPE Laptop
-    url = "opc.tcp://rcpeno02341:5000/" # OPC Server on new RCPE laptop
-
-    # url = "opc.tcp://18-nf010:5000/" #OPC Server on FTIR Laptop
+async def main(flow_rate_A, flow_rate_B, time_pumping, url = ASIA_URL):
+    # ----------- url of OPCUA in opcua_session.ASIA_URL -----------
+    # The session and the pumps are shared by all calls (opcua_session.py), only the first call connects
+    session = get_session(url)
+    # ------ Here you can define and operate all your pumps -------
+    pump13A = await session.device(Pump, "24196", "A")
+    pump13B = await session.device(Pump, "24196", "B")
+    # pump13A = await session.device(Pump, "8064112", "A")
+    # pump13B = await session.device(Pump, "8064112", "B")
+    # await asyncio.gather(pump13A.activate(), pump13B.activate())
     
-    # -----------------------------------------------------------------
-
-
-    logger.info(f"OPC-UA Client: Connecting to {url} ...")
-    async with Client(url=url) as client:
-        # ------ Here you can define and operate all your pumps -------
-        pump13A = await Pump.create(client, "24196", "A")
-        pump13B = await Pump.create(client, "24196", "B")
-        # pump13A = await Pump.create(client, "8064112", "A")
-        # pump13B = await Pump.create(client, "8064112", "B")
-        # await asyncio.gather(pump13A.activate(), pump13B.activate())
+    
+    flowrate_levels = (Level(flow_rate_A, flow_rate_B, time_pumping), # filling the system with reaction mixture
+                       Level(0, 0, 0),) # collecting, cleaning the tip
+    for flowrate_level in flowrate_levels:
+        # await asyncio.sleep(10) # Add a delay (in seconds) before pumps start
+        if  flowrate_level.flowrate_A == 0: 
+            await pump13A._call_method(pump13A.METHOD_STOP)
+            logger.info(f"{pump13A.name}: Pump stopped.")
+        else: 
+            await pump13A.set_flowrate_to(flowrate_level.flowrate_A)
         
+        if flowrate_level.flowrate_B == 0: 
+            await pump13B._call_method(pump13B.METHOD_STOP)
+            logger.info(f"{pump13B.name}: Pump stopped.")
+        else:
+            await pump13B.set_flowrate_to(flowrate_level.flowrate_B)
+        await asyncio.sleep(flowrate_level.time_in_seconds)
         
-        flowrate_levels = (Level(flow_rate_A, flow_rate_B, time_pumping), # filling the system with reaction mixture
-                           Level(0, 0, 0),) # collecting, cleaning the tip
-        for flowrate_level in flowrate_levels:
-            # await asyncio.sleep(10) # Add a delay (in seconds) before pumps start
-            if  flowrate_level.flowrate_A == 0: 
-                await pump13A._call_method(pump13A.METHOD_STOP)
-                logger.info(f"{pump13A.name}: Pump stopped.")
-            else: 
-                await pump13A.set_flowrate_to(flowrate_level.flowrate_A)
-            
-            if flowrate_level.flowrate_B == 0: 
-                await pump13B._call_method(pump13B.METHOD_STOP)
-                logger.info(f"{pump13B.name}: Pump stopped.")
-            else:
-                await pump13B.set_flowrate_to(flowrate_level.flowrate_B)
-            await asyncio.sleep(flowrate_level.time_in_seconds)
-            
 
 
 
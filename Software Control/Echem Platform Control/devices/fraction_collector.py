@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
+import os
+import sys
 import asyncio
-from asyncua import Client, ua
+from asyncua import ua
 from loguru import logger
-import sys
 import numpy as np
+# the shared sessions are next to this file, imported by path so that the module also runs as a script
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from opcua_session import get_session, ASIA_URL
 
 __all__ = ['FractionCollector']
 
@@ -150,25 +154,21 @@ class FC(State):
         await self.ValvePosition.write_value("WASTE")
         logger.info(f"{self.name}: Valve of fraction collector in waste position")
     
-async def main(tube, valve_position):
-
-    url = "opc.tcp://rcpeno02341:5000/" # OPC Server on new RCPE laptop
-
-    logger.info(f"OPC-UA Client: Connecting to {url} ...")
-    async with Client(url=url) as client:
-        # ------ Here you can define and operate all your pumps -------
-        AsiaFC = await FC.create(client, "20475", "B")
-        # vial = Level(tube)
-        await AsiaFC.move_to_tube(tube)
-
-        if valve_position == "waste":
-            await AsiaFC.valve_to_waste_position()
-        elif valve_position == "collect":
-            await AsiaFC.valve_to_collect_position()
-        elif valve_position == "beaker_waste":
-            await AsiaFC.cleaning_tip(130, 70)
-        # await asyncio.sleep(4)
-        # await AsiaFC.valve_to_collect_position()
+async def main(tube, valve_position, url = ASIA_URL):
+
+    # The session and the collector are shared by all calls (opcua_session.py), only the first call connects
+    AsiaFC = await get_session(url).device(FC, "20475", "B")
+    # vial = Level(tube)
+    await AsiaFC.move_to_tube(tube)
+
+    if valve_position == "waste":
+        await AsiaFC.valve_to_waste_position()
+    elif valve_position == "collect":
+        await AsiaFC.valve_to_collect_position()
+    elif valve_position == "beaker_waste":
+        await AsiaFC.cleaning_tip(130, 70)
+    # await asyncio.sleep(4)
+    # await AsiaFC.valve_to_collect_position()
 
 
 
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+'''
+Long-lived OPC-UA sessions to the server of the Syrris Asia devices (Asia_syringe_pump, fraction_collector).
+
+One session per server url is opened on first use and shared by every procedure, together with the
+device handles (Pump, FC) created on it, so a slug transfer or a reaction does not pay the session
+setup and the node browsing again. A keep-alive task reads the server state every keepalive s, if the
+server does not answer the session is opened again with exponential backoff and the handles are rebuilt.
+A procedure that needs a device while the server is down gets a ConnectionError after max_attempts
+attempts, only the keep-alive task keeps trying.
+'''
+import asyncio
+from asyncua import Client, ua
+from loguru import logger
+
+__all__ = ['DeviceSession', 'get_session', 'close_sessions']
+
+ASIA_URL = "opc.tcp://rcpeno02341:5000/" # OPC Server on new RCPE laptop
+# ASIA_URL = "opc.tcp://rcpeno00472:5000/" #OPC Server on RCPE Laptop
+# ASIA_URL = "opc.tcp://18-nf010:5000/" #OPC Server on FTIR Laptop
+
+# Errors of a lost or refused connection (asyncio.TimeoutError and ConnectionError are OSErrors from Python 3.11 on)
+CONNECTION_ERRORS = (OSError, asyncio.TimeoutError, ua.UaError)
+
+
+class DeviceSession():
+    '''
+    Shared session to the OPC-UA server of the devices
+
+    :param url: url of the OPC-UA server
+    :param timeout: request timeout (s)
+    :param keepalive: seconds between two reads of the server state
+    :param backoff: first delay (s) between connection attempts, doubled after each failed attempt
+    :param max_backoff: longest delay (s) between the reconnection attempts of the keep-alive task
+    :param max_attempts: connection attempts of a device request before it raises ConnectionError
+    '''
+
+    def __init__(self, url, timeout = 4, keepalive = 5, backoff = 1, max_backoff = 60, max_attempts = 3):
+        if max_attempts < 1:
+            raise ValueError("max_attempts has to be at least 1")
+        self.url = url
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.loop = None
+        self.client = None
+        self.handles = {}
+        self.lock = None
+        self.keeper = None
+
+    async def get_client(self):
+        #Connected client, the session is opened if there is none
+        self._bind_loop()
+        async with self.lock:
+            await self._ensure_connected()
+            return self.client
+
+    async def device(self, device_class, *args):
+        #Handle device_class.create(client, *args) shared by all callers, e.g. device(Pump, "24196", "A")
+        self._bind_loop()
+        async with self.lock:
+            await self._ensure_connected()
+            key = (device_class, *args)
+            if key not in self.handles:
+                self.handles[key] = await device_class.create(self.client, *args)
+            return self.handles[key]
+
+    async def close(self):
+        if self.keeper is not None:
+            self.keeper.cancel()
+            self.keeper = None
+        await self._disconnect()
+
+    def _bind_loop(self):
+        # the client, the lock and the keep-alive task belong to the event loop they were created in
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            self.loop = loop
+            self.client = None
+            self.handles = {}
+            self.lock = asyncio.Lock()
+            self.keeper = None
+
+    async def _ensure_connected(self):
+        if self.client is None:
+            await self._connect(self.max_attempts)
+        if self.keeper is None or self.keeper.done():
+            self.keeper = asyncio.create_task(self._keep_alive())
+
+    async def _connect(self, attempts):
+        #Opens the session in up to attempts attempts with exponential backoff, raises ConnectionError otherwise
+        delay = self.backoff
+        attempt = 0
+        while True:
+            attempt += 1
+            client = Client(url = self.url, timeout = self.timeout)
+            logger.info(f"OPC-UA Client: Connecting to {self.url} ...")
+            try:
+                await client.connect()
+                break
+            except CONNECTION_ERRORS as error:
+                if attempt >= attempts:
+                    raise ConnectionError(f"no session to {self.url} after {attempt} attempts") from error
+                logger.warning(f"OPC-UA Client: connecting to {self.url} failed ({error!r}), next attempt in {delay} s")
+                await asyncio.sleep(delay)
+                delay = min(2 * delay, self.max_backoff)
+        self.client = client
+        self.handles = {}
+        logger.info(f"OPC-UA Client: Connected to {self.url}")
+
+    async def _disconnect(self):
+        client, self.client, self.handles = self.client, None, {}
+        if client is not None:
+            try:
+                await client.disconnect()
+            except CONNECTION_ERRORS:
+                pass
+
+    async def _keep_alive(self):
+        retry = None
+        while True:
+            await asyncio.sleep(self.keepalive if retry is None else retry)
+            # one attempt per round, the lock is only held for the attempt so device requests do not wait out the backoff
+            async with self.lock:
+                if self.client is not None:
+                    try:
+                        await asyncio.wait_for(self.client.nodes.server_state.read_value(), self.timeout)
+                    except CONNECTION_ERRORS as error:
+                        logger.warning(f"OPC-UA Client: session to {self.url} lost ({error!r}), reconnecting")
+                        await self._disconnect()
+                if self.client is None:
+                    try:
+                        await self._connect(1)
+                    except ConnectionError as error:
+                        retry = self.backoff if retry is None else min(2 * retry, self.max_backoff)
+                        logger.warning(f"OPC-UA Client: {error}, next attempt in {retry} s")
+                        continue
+                retry = None
+
+
+_sessions = {}
+
+def get_session(url = ASIA_URL, **kwargs):
+    #The shared session to url, created on first use (kwargs are passed to DeviceSession then)
+    if url not in _sessions:
+        _sessions[url] = DeviceSession(url, **kwargs)
+    return _sessions[url]
+
+async def close_sessions():
+    for session in _sessions.values():
+        await session.close()
+    _sessions.clear()
@@ -1,54 +1,171 @@
+import sys
 import asyncio
-import os
 import logging
 from datetime import datetime
 from asyncua import Server, ua
+from job_queue import add_job_queue, validate_recipe
+from historian import Historian, attach_historian, historize_object
+from data_changes import DataChanges
 
-async def main():
-    # Serversetup
+ENDPOINT = "opc.tcp://introduce IP/LiquidhandlerCommunication/"
+# Publishing interval (ms) of the server's own subscription to the handshake variables
+SUBSCRIPTION_PERIOD = 10
+# Every change of the variables of these objects is recorded (historian.py) and readable with HistoryRead,
+# device objects added to the server are historized by adding them here
+HISTORIZED_OBJECTS = ["LiquidHandler", "Optimizer", "JobQueue"]
+HISTORY_PATH = "echem_history.jsonl.gz"
+
+_logger = logging.getLogger("EchemServer")
+
+
+def parse_recipe(text):
+    '''
+    Converts RecipeSTR into the integer list published on Recipe:
+    flow rate (uL/min), reaction time (s), voltage (V), current (mA) * 100, then (vial, volume (uL)) pairs.
+    Raises ValueError if the string is not such a recipe.
+    '''
+    fields = [field.strip() for field in str(text).split(",")]
+    try:
+        recipe = [int(field) for field in fields]
+    except ValueError:
+        raise ValueError(f"recipe fields have to be integers: {text!r}") from None
+    return validate_recipe(recipe)
+
+async def build_server(endpoint = ENDPOINT):
+    '''
+    Sets up the server with the LiquidHandler, Optimizer and JobQueue objects.
+    Returns the server (not started yet) and its variables by name, the JobQueue is server.job_queue.
+    '''
     server = Server()
-    server.name = "LiquidHandlerCommunicationServer"     
+    server.name = "LiquidHandlerCommunicationServer"
     await server.init()
 
-    server.set_endpoint("opc.tcp://introduce IP/LiquidhandlerCommunication/")
+    server.set_endpoint(endpoint)
     server.set_server_name("LiquidHandlerCommunication")
     uri = "liquidhandler"
     idx = await server.register_namespace(uri)
+    variables = await add_liquid_handler(server, idx)
+
+    LiquidHandler = await server.nodes.objects.get_child(f"{idx}:LiquidHandler")
+    variables['uptime'] = await LiquidHandler.add_variable(idx, "uptime", 0)
+    await variables['uptime'].set_read_only()
+
+    # Ask/tell exchange with the optimizer (Bayesian Optimization/opcua_optimizer.py)
+    Optimizer = await server.nodes.objects.add_object(idx, "Optimizer")
+
+    variables['SuggestionId'] = await Optimizer.add_variable(idx, "SuggestionId", 0, ua.VariantType.Int32)
+    await variables['SuggestionId'].set_writable()
+
+    variables['Conditions'] = await Optimizer.add_variable(idx, "Conditions", [0.0] * 6, ua.VariantType.Double)
+    await variables['Conditions'].set_writable()
+
+    variables['ConditionNames'] = await Optimizer.add_variable(idx, "ConditionNames", ["RAE", "Acid", "Electrolyte", "acid_type", "Charge", "Current"], ua.VariantType.String)
+    await variables['ConditionNames'].set_writable()
+
+    variables['ResultId'] = await Optimizer.add_variable(idx, "ResultId", 0, ua.VariantType.Int32)
+    await variables['ResultId'].set_writable()
+
+    variables['Result'] = await Optimizer.add_variable(idx, "Result", [0.0] * 13, ua.VariantType.Double)
+    await variables['Result'].set_writable()
+
+    # Recipes queued with SubmitRecipe and pulled by Run.py with ClaimJob (job_queue.py)
+    server.job_queue, job_variables = await add_job_queue(server, idx)
+    variables.update(job_variables)
+
+    return server, variables
 
-    LiquidHandler = await server.nodes.objects.add_object(idx, "LiquidHandler")
 
-    start = await LiquidHandler.add_variable(idx,"Start", 0)
-    await start.set_writable()
+async def add_liquid_handler(server, idx, name = "LiquidHandler"):
+    #Object with the Start/End handshake and the recipe of one platform, returns its variables by name
+    LiquidHandler = await server.nodes.objects.add_object(idx, name)
+    variables = {}
 
-    recipe = await LiquidHandler.add_variable(idx, "Recipe", [1,100,2,100,3,100,4,100])
-    await recipe.set_read_only()
+    variables['Start'] = await LiquidHandler.add_variable(idx,"Start", 0)
+    await variables['Start'].set_writable()
 
-    recipeSTR = await LiquidHandler.add_variable(idx, "RecipeSTR", "1,100,2,100,3,100,4,100")
-    await recipeSTR.set_writable()
+    variables['Recipe'] = await LiquidHandler.add_variable(idx, "Recipe", [1,100,2,100,3,100,4,100])
+    await variables['Recipe'].set_read_only()
 
-    uptime = await LiquidHandler.add_variable(idx, "uptime", 0)
-    await uptime.set_read_only()
+    variables['RecipeSTR'] = await LiquidHandler.add_variable(idx, "RecipeSTR", "1,100,2,100,3,100,4,100")
+    await variables['RecipeSTR'].set_writable()
 
-    end = await LiquidHandler.add_variable(idx, "End", 0)
-    await end.set_writable()
+    # "ok" or why the last RecipeSTR was rejected (Recipe keeps the previous recipe then)
+    variables['RecipeStatus'] = await LiquidHandler.add_variable(idx, "RecipeStatus", "ok")
+    await variables['RecipeStatus'].set_read_only()
+
+    variables['End'] = await LiquidHandler.add_variable(idx, "End", 0)
+    await variables['End'].set_writable()
+
+    return variables
+
+
+def render_status(name, status):
+    #One status line per change, written without clearing the console
+    print(f"{datetime.now():%H:%M:%S}  {name}  uptime {status['uptime']} s  Start {status['Start']}  End {status['End']}  Recipe {status['Recipe']}", flush = True)
+
+async def count_uptime(uptime):
+    while True:
+        await asyncio.sleep(1)
+        await uptime.write_value(await uptime.get_value() + 1)
+
+async def serve(server, variables, handlers = None):
+    '''
+    Reacts to writes of RecipeSTR, Start and End: a changed RecipeSTR is validated and published
+    on Recipe right away, Start and End changes update the status line.
+
+    :param handlers: {object name: variables} of the liquid handler objects (the LiquidHandler of variables if not given)
+    '''
+    handlers = {"LiquidHandler": variables} if handlers is None else handlers
+    changes = asyncio.Queue()
+    subscription = await server.create_subscription(SUBSCRIPTION_PERIOD, DataChanges(changes))
+    watched = {}
+    statuses = {}
+    for handler, handler_variables in handlers.items():
+        for name in ['RecipeSTR', 'Start', 'End']:
+            watched[handler_variables[name].nodeid] = (handler, name)
+        statuses[handler] = {'Start': None, 'End': None, 'Recipe': await handler_variables['Recipe'].get_value(), 'uptime': 0}
+    await subscription.subscribe_data_change([handlers[handler][name] for handler, name in watched.values()])
+    uptime = asyncio.create_task(count_uptime(variables['uptime']))
+
+    try:
+        while True:
+            node, value = await changes.get()
+            handler, name = watched[node.nodeid]
+            handler_variables, status = handlers[handler], statuses[handler]
+            if name == 'RecipeSTR':
+                try:
+                    recipe = parse_recipe(value)
+                except ValueError as error:
+                    _logger.warning("RecipeSTR of %s rejected: %s", handler, error)
+                    await handler_variables['RecipeStatus'].write_value(str(error))
+                    continue
+                if recipe != status['Recipe']:
+                    await handler_variables['Recipe'].write_value(recipe)
+                    status['Recipe'] = recipe
+                await handler_variables['RecipeStatus'].write_value("ok")
+            else:
+                status[name] = value
+            status['uptime'] = await variables['uptime'].get_value()
+            render_status(handler, status)
+    finally:
+        uptime.cancel()
+        await subscription.delete()
+
+async def start_historian(server, path = HISTORY_PATH, objects = HISTORIZED_OBJECTS):
+    #Records the changes of the variables of objects in a ring buffer spilled to path (needs a started server)
+    historian = await attach_historian(server, Historian(path = path))
+    for name in objects:
+        await historize_object(server, await server.nodes.objects.get_child(f"2:{name}"))
+    return historian
+
+async def main(endpoint = ENDPOINT):
+    server, variables = await build_server(endpoint)
 
     print("Starting server!")
 
     async with server:
-        while True:
-            await asyncio.sleep(1)
-            new_uptime = await uptime.get_value() + 1
-            recipeitl = []
-            STR = await recipeSTR.get_value()
-            listSTR = STR.split(",")
-            for s in listSTR:
-                recipeitl.append(int(s))
-            await recipe.write_value(recipeitl)
-            os.system("cls")
-            print(new_uptime)
-            print(await recipe.get_value())
-            print(await start.get_value())
-            await uptime.write_value(new_uptime)
+        await start_historian(server)
+        await serve(server, variables)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main(*sys.argv[1:2]))
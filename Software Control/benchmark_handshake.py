@@ -0,0 +1,229 @@
+'''
+Load and latency benchmark of the Start -> Recipe -> End handshake of the recipe server.
+
+Starts Echem Server.py on localhost in its own process with one LiquidHandler object per client
+pair, then runs the handshakes of N pairs concurrently. The optimizer side of a pair does what
+opcua_optimizer.ask does (RecipeSTR, wait for Recipe, Start = 1, wait for End = 1, Start = 0,
+wait for End = 0), the platform side answers with an empty slug:
+    subscribe  Run.run_closed_loop itself (--period ms publishing interval), loaded from Run.py with runSlug
+               replaced by a stub that records the recipe and writes End = 1 (Run.py connects to the devices on import)
+    poll       model of the loop of Run.py before subscriptions: Start/End read every --poll-interval s,
+               recipe read --settle s after Start
+Reports p50/p95/p99 of the round trip and of Start -> recipe read, and the handshakes per second.
+
+    python benchmark_handshake.py --clients 1 2 4 8 --handshakes 2000 --output handshake.json
+    python benchmark_handshake.py --platform poll --poll-interval 1 --settle 2 --handshakes 20   # Run.py timing
+'''
+import os
+import sys
+import ast
+import json
+import time
+import asyncio
+import argparse
+import platform
+import importlib.util
+import multiprocessing
+import numpy as np
+from asyncua import Client, ua
+from data_changes import DataChanges
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RUN_PATH = os.path.join(HERE, "Echem Platform Control", "Run.py")
+
+
+def load_server_module():
+    #Echem Server.py is a script with a space in its name, it is loaded from its path
+    sys.path.insert(0, HERE)
+    spec = importlib.util.spec_from_file_location("echem_server", os.path.join(HERE, "Echem Server.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def load_closed_loop(run_slug):
+    '''
+    run_closed_loop of Run.py, compiled from its source in a namespace where runSlug is run_slug.
+    Run.py itself can not be imported, it opens the serial port and runs its main on import.
+    '''
+    with open(RUN_PATH, 'r') as run_file:
+        tree = ast.parse(run_file.read(), RUN_PATH)
+    nodes = [node for node in tree.body if (isinstance(node, ast.AsyncFunctionDef) and node.name == 'run_closed_loop') or
+             (isinstance(node, ast.Assign) and any(getattr(t, 'id', None) == 'subscription_period' for t in node.targets))]
+    namespace = {'asyncio': asyncio, 'DataChanges': DataChanges, 'runSlug': run_slug, 'print': lambda *args, **kwargs: None}
+    exec(compile(ast.Module(body = nodes, type_ignores = []), RUN_PATH, 'exec'), namespace)
+    return namespace['run_closed_loop']
+
+def handler_name(k):
+    return "LiquidHandler" if k == 0 else f"LiquidHandler{k + 1}"
+
+def run_server(endpoint, n_handlers, ready):
+    #Server process: the server of Echem Server.py with n_handlers liquid handler objects, status lines discarded
+    sys.stdout = open(os.devnull, 'w')
+    server_module = load_server_module()
+
+    async def serve():
+        server, variables = await server_module.build_server(endpoint)
+        idx = await server.get_namespace_index("liquidhandler")
+        handlers = {handler_name(0): variables}
+        for k in range(1, n_handlers):
+            handlers[handler_name(k)] = await server_module.add_liquid_handler(server, idx, handler_name(k))
+        async with server:
+            ready.set()
+            await server_module.serve(server, variables, handlers)
+
+    asyncio.run(serve())
+
+
+async def get_handler_variables(client, name):
+    return {v: await client.nodes.root.get_child(["0:Objects", f"2:{name}", f"2:{v}"]) for v in ['Start', 'End', 'Recipe', 'RecipeSTR']}
+
+async def subscribe(client, variables, names, period):
+    changes = DataChanges(names = {variables[n].nodeid: n for n in names})
+    subscription = await client.create_subscription(period, changes)
+    await subscription.subscribe_data_change([variables[n] for n in names])
+    return changes, subscription
+
+async def optimizer_side(url, name, n_handshakes, period, timings):
+    async with Client(url = url, timeout = 10) as client:
+        variables = await get_handler_variables(client, name)
+        changes, subscription = await subscribe(client, variables, ['End', 'Recipe'], period)
+        for k in range(n_handshakes):
+            recipe = [100 + k % 50, 400 + k, 7, 600, 3, 83, 4, 87]
+            await changes.wait_for('End', lambda v: v == 0)
+            start = time.perf_counter()
+            await variables['RecipeSTR'].write_value(ua.Variant(','.join(str(v) for v in recipe), ua.VariantType.String))
+            await changes.wait_for('Recipe', lambda v: list(v) == recipe)
+            timings['start'].append(time.perf_counter())
+            await variables['Start'].write_value(ua.Variant(1, ua.VariantType.Int64))
+            await changes.wait_for('End', lambda v: v == 1)
+            await variables['Start'].write_value(ua.Variant(0, ua.VariantType.Int64))
+            await changes.wait_for('End', lambda v: v == 0)
+            timings['round_trip'].append(time.perf_counter() - start)
+            timings['expected'].append(recipe)
+        await subscription.delete()
+
+async def platform_poll(url, name, n_handshakes, poll_interval, settle, timings):
+    #The former Run.run_closed_loop: Start and End read every poll_interval, the recipe settle s after Start
+    async with Client(url = url, timeout = 10) as client:
+        variables = await get_handler_variables(client, name)
+        done = 0
+        while done < n_handshakes:
+            start = await variables['Start'].get_value()
+            end = await variables['End'].get_value()
+            await asyncio.sleep(poll_interval)
+            if start == 1 and end == 0:
+                await asyncio.sleep(settle)
+                recipe = await variables['Recipe'].get_value()
+                timings['recipe'].append((time.perf_counter(), list(recipe)))
+                await variables['End'].write_value(ua.Variant(1, ua.VariantType.Int64))
+                done += 1
+            if start == 0 and end == 1:
+                await variables['End'].write_value(ua.Variant(0, ua.VariantType.Int64))
+        # the last End reset
+        while await variables['Start'].get_value() != 0:
+            await asyncio.sleep(poll_interval)
+        await variables['End'].write_value(ua.Variant(0, ua.VariantType.Int64))
+
+async def platform_closed_loop(url, name, period, timings):
+    #Run.run_closed_loop with an empty slug, runs until it is cancelled
+    async def run_slug(ports, Recipe, EndVar = None):
+        timings['recipe'].append((time.perf_counter(), list(Recipe)))
+        await EndVar.write_value(1)
+
+    run_closed_loop = load_closed_loop(run_slug)
+    async with Client(url = url, timeout = 10) as client:
+        variables = await get_handler_variables(client, name)
+        await run_closed_loop(client, variables['Start'], variables['End'], variables['Recipe'], None, period)
+
+async def run_pairs(url, n_clients, n_handshakes, settings):
+    timings = [{'start': [], 'round_trip': [], 'expected': [], 'recipe': []} for _ in range(n_clients)]
+    per_pair = max(n_handshakes // n_clients, 1)
+    tasks, loops = [], []
+    start = time.perf_counter()
+    for k in range(n_clients):
+        name = handler_name(k)
+        tasks.append(optimizer_side(url, name, per_pair, settings['period'], timings[k]))
+        if settings['platform'] == 'poll':
+            tasks.append(platform_poll(url, name, per_pair, settings['poll_interval'], settings['settle'], timings[k]))
+        else:
+            # the closed loop never returns, it is stopped once its optimizer side is done
+            loops.append(asyncio.create_task(platform_closed_loop(url, name, settings['period'], timings[k])))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for loop in loops:
+            loop.cancel()
+        await asyncio.gather(*loops, return_exceptions = True)
+    for loop in loops:
+        if not loop.cancelled() and loop.exception() is not None:
+            raise loop.exception()
+    return timings, time.perf_counter() - start
+
+def percentiles(values):
+    values = np.asarray(values) * 1000
+    return {'p50': float(np.percentile(values, 50)), 'p95': float(np.percentile(values, 95)),
+            'p99': float(np.percentile(values, 99)), 'max': float(values.max())}
+
+def benchmark(n_clients, n_handshakes, settings, port):
+    url = f"opc.tcp://127.0.0.1:{port}/LiquidhandlerCommunication/"
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    server = context.Process(target = run_server, args = (url, n_clients, ready), daemon = True)
+    server.start()
+    try:
+        if not ready.wait(60):
+            raise RuntimeError("server did not start")
+        timings, wall = asyncio.run(run_pairs(url, n_clients, n_handshakes, settings))
+    finally:
+        server.terminate()
+        server.join()
+
+    round_trips, start_to_recipe, stale = [], [], 0
+    for pair in timings:
+        round_trips += pair['round_trip']
+        for started, (read, recipe), expected in zip(pair['start'], pair['recipe'], pair['expected']):
+            start_to_recipe.append(read - started)
+            stale += recipe != expected
+    return {'clients': n_clients, 'handshakes': len(round_trips), 'wall_time': wall,
+            'throughput': len(round_trips) / wall, 'round_trip_ms': percentiles(round_trips),
+            'start_to_recipe_ms': percentiles(start_to_recipe), 'stale_recipes': int(stale)}
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Handshake latency benchmark of the recipe server')
+    parser.add_argument('--clients', type = int, nargs = '+', default = [1, 2, 4, 8], help = 'optimizer/platform pairs')
+    parser.add_argument('--handshakes', type = int, default = 1000, help = 'handshakes per setting, shared by the pairs')
+    parser.add_argument('--platform', choices = ['subscribe', 'poll'], default = 'subscribe')
+    parser.add_argument('--period', type = float, default = 10, help = 'publishing interval (ms) of the subscriptions')
+    parser.add_argument('--poll-interval', type = float, default = 1.0, help = 's, poll platform')
+    parser.add_argument('--settle', type = float, default = 2.0, help = 's between Start and the recipe read, poll platform')
+    parser.add_argument('--port', type = int, default = 48410)
+    parser.add_argument('--output', default = None, help = 'json report, printed to stdout if not given')
+    args = parser.parse_args(argv)
+
+    settings = {'platform': args.platform, 'period': args.period, 'poll_interval': args.poll_interval, 'settle': args.settle}
+    results = []
+    for k, n_clients in enumerate(args.clients):
+        # a new port per setting, the previous server's socket may still be closing
+        entry = benchmark(n_clients, args.handshakes, settings, args.port + k)
+        results.append(entry)
+        print(json.dumps(entry), file = sys.stderr)
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'settings': settings,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent = 2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as output_file:
+            output_file.write(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
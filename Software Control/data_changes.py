@@ -0,0 +1,33 @@
+'''
+asyncua subscription handler shared by the recipe server (Echem Server.py), its clients (Run.py,
+opcua_optimizer.py) and the handshake benchmark.
+'''
+import asyncio
+
+
+class DataChanges:
+    '''
+    Keeps the latest value of every subscribed variable and forwards each data change to a queue.
+
+    :param queue: asyncio.Queue that gets (node, value) for every change (not forwarded if None)
+    :param names: {node id: name} the latest values are kept by (by node id if not given)
+    '''
+
+    def __init__(self, queue = None, names = None):
+        self.queue = queue
+        self.names = {} if names is None else names
+        self.values = {}
+        self.changed = asyncio.Event()
+
+    def datachange_notification(self, node, val, data):
+        self.values[self.names.get(node.nodeid, node.nodeid)] = val
+        if self.queue is not None:
+            self.queue.put_nowait((node, val))
+        self.changed.set()
+
+    async def wait_for(self, name, condition):
+        #Waits until the latest value of name satisfies condition and returns it
+        while not (name in self.values and condition(self.values[name])):
+            self.changed.clear()
+            await self.changed.wait()
+        return self.values[name]
@@ -0,0 +1,276 @@
+'''
+Historian of the OPC-UA recipe server (Echem Server.py).
+
+Every change of a historized variable is kept in a ring buffer per variable and spilled
+periodically to a gzip file of JSON lines, one change per line:
+    {"n": "ns=2;i=3", "t": 1718000000.25, "y": 6, "v": 1}
+(node id, source timestamp in s since epoch, OPC-UA variant type, value).
+The Historian is an asyncua history storage, so clients get time ranges with a HistoryRead
+(node.read_raw_history) instead of polling. Ranges older than the ring buffer are read from the files.
+
+The file is rotated once it is max_file_size bytes or max_file_age s old (echem_history.000001.jsonl.gz, ...)
+and only the newest max_files rotated files are kept. The time range of every file is kept in an index
+(echem_history.jsonl.gz.index), so a read only opens the files that overlap the requested range.
+'''
+import os
+import gzip
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from asyncua import ua
+from asyncua.server.history import HistoryStorageInterface
+
+_logger = logging.getLogger("Historian")
+
+
+class Historian(HistoryStorageInterface):
+    '''
+    :param capacity: changes kept in memory per variable
+    :param path: gzip JSON lines file the changes are spilled to (memory only if None)
+    :param spill_every: seconds between spills to the file
+    :param max_file_size: size (bytes) at which the file is rotated
+    :param max_file_age: age (s) at which the file is rotated
+    :param max_files: rotated files kept, older ones are deleted
+    '''
+
+    def __init__(self, capacity = 10000, path = None, spill_every = 60, max_history_data_response_size = 10000,
+                 max_file_size = 16 * 2**20, max_file_age = 24 * 3600, max_files = 30):
+        super().__init__(max_history_data_response_size)
+        self.capacity = capacity
+        self.path = path
+        self.spill_every = spill_every
+        self.max_file_size = max_file_size
+        self.max_file_age = max_file_age
+        self.max_files = max_files
+        self.buffers = {}
+        self.periods = {}
+        self.pending = []
+        self.spiller = None
+        # files and index are only touched by one executor thread at a time (a spill and a read can overlap)
+        self.file_lock = threading.Lock()
+        self.index = None if path is None else self._load_index()
+
+    async def init(self):
+        if self.path is not None and self.spiller is None:
+            self.spiller = asyncio.create_task(self._spill_periodically())
+
+    async def new_historized_node(self, node_id, period, count = 0):
+        self.buffers[node_id] = deque(maxlen = count or self.capacity)
+        self.periods[node_id] = period
+
+    async def save_node_value(self, node_id, datavalue):
+        if datavalue.SourceTimestamp is None:
+            datavalue.SourceTimestamp = datavalue.ServerTimestamp or datetime.now(timezone.utc)
+        buffer = self.buffers[node_id]
+        buffer.append(datavalue)
+        period = self.periods[node_id]
+        if period:
+            while buffer and datavalue.SourceTimestamp - buffer[0].SourceTimestamp > period:
+                buffer.popleft()
+        if self.path is not None:
+            self.pending.append((node_id, datavalue))
+
+    async def read_node_history(self, node_id, start, end, nb_values):
+        '''
+        Changes between start and end (inclusive). Without a start the newest changes up to end
+        are returned first, with start > end the range is returned backwards.
+        '''
+        if node_id not in self.buffers:
+            _logger.warning("history read for %s, which is not historized", node_id)
+            return [], None
+        epoch = ua.get_win_epoch()
+        start = epoch if start is None else start
+        end = epoch if end is None else end
+        if start == epoch:
+            low, high, backwards = None, None if end == epoch else end, True
+        elif end == epoch:
+            low, high, backwards = start, None, False
+        elif start > end:
+            low, high, backwards = end, start, True
+        else:
+            low, high, backwards = start, end, False
+
+        results = await self.read_range(node_id, low, high)
+        if backwards:
+            results.reverse()
+        if nb_values and len(results) > nb_values:
+            results = results[:nb_values]
+        cont = None
+        if len(results) > self.max_history_data_response_size:
+            cont = results[self.max_history_data_response_size].SourceTimestamp
+            results = results[:self.max_history_data_response_size]
+        return results, cont
+
+    async def read_range(self, node_id, low = None, high = None):
+        #Changes of a node between low and high (None = unbounded) in time order, from the file and the ring buffer
+        buffer = list(self.buffers[node_id])
+        oldest = buffer[0].SourceTimestamp if buffer else None
+        results = []
+        if self.path is not None and (oldest is None or low is None or low < oldest):
+            await self.spill()
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(None, self._read_file, node_id.to_string(), low, high, oldest)
+        results += [dv for dv in buffer if _within(dv.SourceTimestamp, low, high)]
+        return results
+
+    async def new_historized_event(self, source_id, evtypes, period, count = 0):
+        raise ua.UaStatusCodeError(ua.StatusCodes.BadNotImplemented)
+
+    async def save_event(self, event):
+        pass
+
+    async def read_event_history(self, source_id, start, end, nb_values, evfilter):
+        return [], None
+
+    async def spill(self):
+        #Appends the changes since the last spill to the file (one gzip member per spill),
+        #they stay pending until the write succeeded
+        n = len(self.pending)
+        if n == 0:
+            return
+        lines = []
+        times = []
+        for node_id, dv in self.pending[:n]:
+            try:
+                lines.append(_encode(node_id, dv))
+                times.append(dv.SourceTimestamp.timestamp())
+            except (TypeError, ValueError) as error:
+                # kept in the ring buffer only, it would fail every later spill
+                _logger.warning("change of %s can not be written to the history file: %s", node_id, error)
+        if lines:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._append, ''.join(lines), min(times), max(times))
+        # changes saved during the write are spilled the next time
+        del self.pending[:n]
+
+    async def stop(self):
+        if self.spiller is not None:
+            self.spiller.cancel()
+            self.spiller = None
+        await self.spill()
+
+    async def _spill_periodically(self):
+        while True:
+            await asyncio.sleep(self.spill_every)
+            try:
+                await self.spill()
+            except Exception as error:
+                # the changes stay pending and are written with the next spill
+                _logger.warning("spilling the history to %s failed: %s", self.path, error)
+
+    def _append(self, lines, first, last):
+        with self.file_lock:
+            with gzip.open(self.path, 'at') as history_file:
+                history_file.write(lines)
+            active = self.index['active']
+            if active is None:
+                active = self.index['active'] = {'first': first, 'last': last, 'created': time.time()}
+            else:
+                # a file written before the index has an unknown (None) range, it is read for any range
+                if active['first'] is not None:
+                    active['first'] = min(active['first'], first)
+                    active['last'] = max(active['last'], last)
+            if os.path.getsize(self.path) >= self.max_file_size or time.time() - active['created'] >= self.max_file_age:
+                self._rotate()
+            self._save_index()
+
+    def _rotate(self):
+        #Moves the file to the next numbered file of the index, deletes the oldest ones beyond max_files
+        root, extension = _split_path(self.path)
+        self.index['next'] += 1
+        name = f"{root}.{self.index['next']:06d}{extension}"
+        os.replace(self.path, name)
+        active = self.index['active']
+        self.index['files'].append({'file': name, 'first': active['first'], 'last': active['last']})
+        self.index['active'] = None
+        while len(self.index['files']) > self.max_files:
+            oldest = self.index['files'].pop(0)
+            try:
+                os.remove(oldest['file'])
+            except FileNotFoundError:
+                pass
+
+    def _load_index(self):
+        try:
+            with open(self.path + '.index', 'r') as index_file:
+                return json.load(index_file)
+        except FileNotFoundError:
+            # a history file written without an index is kept as the current file, its time range is unknown
+            active = {'first': None, 'last': None, 'created': time.time()} if os.path.exists(self.path) else None
+            return {'files': [], 'active': active, 'next': 0}
+
+    def _save_index(self):
+        tmp_path = self.path + '.index.tmp'
+        with open(tmp_path, 'w') as index_file:
+            json.dump(self.index, index_file)
+        os.replace(tmp_path, self.path + '.index')
+
+    def _read_file(self, node, low, high, before):
+        #Changes of node between low and high older than before, from the files whose time range overlaps
+        lowest = None if low is None else low.timestamp()
+        highest = min((t.timestamp() for t in (high, before) if t is not None), default = None)
+        results = []
+        with self.file_lock:
+            files = list(self.index['files'])
+            if self.index['active'] is not None:
+                files.append(dict(self.index['active'], file = self.path))
+            for entry in files:
+                if entry['first'] is not None and ((lowest is not None and entry['last'] < lowest) or
+                                                   (highest is not None and entry['first'] > highest)):
+                    continue
+                try:
+                    history_file = gzip.open(entry['file'], 'rt')
+                except FileNotFoundError:
+                    continue
+                with history_file:
+                    for line in history_file:
+                        record = json.loads(line)
+                        if record['n'] != node:
+                            continue
+                        timestamp = datetime.fromtimestamp(record['t'], timezone.utc)
+                        # changes still in the ring buffer are taken from there
+                        if before is not None and timestamp >= before:
+                            continue
+                        if _within(timestamp, low, high):
+                            results.append(_decode(record, timestamp))
+        return results
+
+
+def _split_path(path):
+    #'echem_history.jsonl.gz' -> ('echem_history', '.jsonl.gz'), rotated files are numbered in between
+    directory, name = os.path.split(path)
+    stem, dot, extension = name.partition('.')
+    return os.path.join(directory, stem), dot + extension
+
+def _within(timestamp, low, high):
+    return (low is None or timestamp >= low) and (high is None or timestamp <= high)
+
+def _encode(node_id, dv):
+    value = dv.Value.Value
+    if isinstance(value, datetime):
+        value = value.timestamp()
+    record = {'n': node_id.to_string(), 't': dv.SourceTimestamp.timestamp(), 'y': dv.Value.VariantType.value, 'v': value}
+    return json.dumps(record, separators = (',', ':')) + '\n'
+
+def _decode(record, timestamp):
+    variant_type = ua.VariantType(record['y'])
+    value = record['v']
+    if variant_type == ua.VariantType.DateTime:
+        value = datetime.fromtimestamp(value, timezone.utc)
+    return ua.DataValue(ua.Variant(value, variant_type), SourceTimestamp = timestamp, ServerTimestamp = timestamp)
+
+async def attach_historian(server, historian):
+    #Makes historian the history storage of a server (the storage of a server is initialised by server.init())
+    server.iserver.history_manager.set_storage(historian)
+    await historian.init()
+    return historian
+
+async def historize_object(server, obj):
+    #Historizes every variable of an object (LiquidHandler, or a device object added later)
+    variables = await obj.get_variables()
+    await server.historize_node_data_change(variables, period = None, count = 0)
+    return variables
@@ -0,0 +1,213 @@
+'''
+FIFO job queue of recipes for the OPC-UA recipe server (Echem Server.py).
+
+Clients submit recipes with the SubmitRecipe method of the JobQueue object and get a job id back,
+follow them with GetJobStatus and cancel queued ones with CancelJob. The platform (Run.py) takes the
+oldest queued job with ClaimJob and reports it with CompleteJob, so the next job can start as soon
+as the current one ends instead of waiting for the Start/End handshake.
+'''
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from asyncua import ua, uamethod
+from asyncua.ua.uatypes import get_win_epoch
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+def validate_recipe(recipe):
+    '''
+    Checks an integer recipe as read by Run.py:
+    flow rate (uL/min), reaction time (s), voltage (V), current (mA) * 100, then (vial, volume (uL)) pairs.
+    Returns it as a list of int, raises ValueError if it is not such a recipe.
+    '''
+    recipe = [int(value) for value in recipe]
+    if len(recipe) < 6 or len(recipe) % 2 != 0:
+        raise ValueError(f"recipe needs flow, time, voltage, current and (vial, volume) pairs, got {len(recipe)} fields")
+    if any(value < 0 for value in recipe):
+        raise ValueError(f"recipe fields have to be positive: {recipe}")
+    return recipe
+
+
+class Job:
+    '''
+    A submitted recipe with its state and the times (UTC) it was submitted, started and finished.
+    '''
+
+    def __init__(self, job_id, recipe):
+        self.id = job_id
+        self.recipe = recipe
+        self.state = QUEUED
+        self.submitted = datetime.now(timezone.utc)
+        self.started = None
+        self.finished = None
+
+    def finish(self, state):
+        self.state = state
+        self.finished = datetime.now(timezone.utc)
+
+
+class JobQueue:
+    '''
+    :param max_finished: finished jobs kept for GetJobStatus, older ones are forgotten
+    '''
+
+    def __init__(self, max_finished = 1000):
+        self.jobs = OrderedDict()
+        self.queued = deque()
+        self.finished = deque()
+        self.max_finished = max_finished
+        self.next_id = 1
+        self.current = None
+
+    def __len__(self):
+        return len(self.queued)
+
+    def submit(self, recipe):
+        job = Job(self.next_id, validate_recipe(recipe))
+        self.next_id += 1
+        self.jobs[job.id] = job
+        self.queued.append(job.id)
+        return job
+
+    def cancel(self, job_id):
+        #Cancels a queued job, returns False if it is unknown or has already started
+        job = self.jobs.get(job_id)
+        if job is None or job.state != QUEUED:
+            return False
+        self.queued.remove(job_id)
+        self._finish(job, CANCELLED)
+        return True
+
+    def claim(self):
+        #Oldest queued job, marked as running (None if the queue is empty)
+        if not self.queued:
+            return None
+        job = self.jobs[self.queued.popleft()]
+        job.state = RUNNING
+        job.started = datetime.now(timezone.utc)
+        self.current = job
+        return job
+
+    def complete(self, job_id, succeeded = True):
+        #Reports a running job, returns False if it is unknown or not running
+        job = self.jobs.get(job_id)
+        if job is None or job.state != RUNNING:
+            return False
+        self._finish(job, DONE if succeeded else FAILED)
+        if self.current is job:
+            self.current = None
+        return True
+
+    def status(self, job_id):
+        return self.jobs.get(job_id)
+
+    def _finish(self, job, state):
+        job.finish(state)
+        self.finished.append(job.id)
+        while len(self.finished) > self.max_finished:
+            del self.jobs[self.finished.popleft()]
+
+
+def _argument(name, data_type, description, array = False):
+    argument = ua.Argument()
+    argument.Name = name
+    argument.DataType = ua.NodeId(data_type)
+    argument.ValueRank = 1 if array else -1
+    argument.ArrayDimensions = [0] if array else []
+    argument.Description = ua.LocalizedText(description)
+    return argument
+
+async def add_job_queue(server, idx, queue = None):
+    '''
+    Adds the JobQueue object with its methods and the QueueLength / CurrentJob variables to the server.
+    Returns the JobQueue and the variables by name.
+    '''
+    queue = JobQueue() if queue is None else queue
+    Jobs = await server.nodes.objects.add_object(idx, "JobQueue")
+    variables = {}
+
+    variables['QueueLength'] = await Jobs.add_variable(idx, "QueueLength", 0, ua.VariantType.Int32)
+    await variables['QueueLength'].set_read_only()
+
+    variables['CurrentJob'] = await Jobs.add_variable(idx, "CurrentJob", 0, ua.VariantType.Int32)
+    await variables['CurrentJob'].set_read_only()
+
+    async def publish():
+        current = 0 if queue.current is None else queue.current.id
+        await variables['QueueLength'].write_value(ua.Variant(len(queue), ua.VariantType.Int32))
+        await variables['CurrentJob'].write_value(ua.Variant(current, ua.VariantType.Int32))
+
+    def timestamp(value):
+        return ua.Variant(get_win_epoch() if value is None else value, ua.VariantType.DateTime)
+
+    @uamethod
+    async def submit_recipe(parent, flow_rate, reaction_time, voltage, current, vials, volumes):
+        # a rejected recipe is answered with BadInvalidArgument
+        if len(vials) != len(volumes):
+            return ua.StatusCode(ua.StatusCodes.BadInvalidArgument)
+        recipe = [flow_rate, reaction_time, voltage, current]
+        for vial, volume in zip(vials, volumes):
+            recipe += [vial, volume]
+        try:
+            job = queue.submit(recipe)
+        except ValueError:
+            return ua.StatusCode(ua.StatusCodes.BadInvalidArgument)
+        await publish()
+        return ua.Variant(job.id, ua.VariantType.Int32)
+
+    @uamethod
+    async def cancel_job(parent, job_id):
+        cancelled = queue.cancel(job_id)
+        await publish()
+        return ua.Variant(cancelled, ua.VariantType.Boolean)
+
+    @uamethod
+    async def get_job_status(parent, job_id):
+        job = queue.status(job_id)
+        if job is None:
+            return (ua.Variant('unknown', ua.VariantType.String), ua.Variant([], ua.VariantType.Int64),
+                    timestamp(None), timestamp(None), timestamp(None))
+        return (ua.Variant(job.state, ua.VariantType.String), ua.Variant(job.recipe, ua.VariantType.Int64),
+                timestamp(job.submitted), timestamp(job.started), timestamp(job.finished))
+
+    @uamethod
+    async def claim_job(parent):
+        job = queue.claim()
+        await publish()
+        if job is None:
+            return (ua.Variant(0, ua.VariantType.Int32), ua.Variant([], ua.VariantType.Int64))
+        return (ua.Variant(job.id, ua.VariantType.Int32), ua.Variant(job.recipe, ua.VariantType.Int64))
+
+    @uamethod
+    async def complete_job(parent, job_id, succeeded):
+        completed = queue.complete(job_id, succeeded)
+        await publish()
+        return ua.Variant(completed, ua.VariantType.Boolean)
+
+    job_id = _argument("JobId", ua.ObjectIds.Int32, "id returned by SubmitRecipe")
+    state = _argument("State", ua.ObjectIds.String, "queued, running, done, failed, cancelled or unknown")
+    recipe = _argument("Recipe", ua.ObjectIds.Int64, "recipe as read by Run.py", array = True)
+    await Jobs.add_method(idx, "SubmitRecipe", submit_recipe,
+                          [_argument("FlowRate", ua.ObjectIds.UInt32, "uL/min"),
+                           _argument("ReactionTime", ua.ObjectIds.UInt32, "s"),
+                           _argument("Voltage", ua.ObjectIds.UInt32, "V"),
+                           _argument("Current", ua.ObjectIds.UInt32, "mA * 100"),
+                           _argument("Vials", ua.ObjectIds.UInt32, "liquid handler positions", array = True),
+                           _argument("Volumes", ua.ObjectIds.UInt32, "uL per vial", array = True)],
+                          [job_id])
+    await Jobs.add_method(idx, "CancelJob", cancel_job, [job_id],
+                          [_argument("Cancelled", ua.ObjectIds.Boolean, "False if the job has started or is unknown")])
+    await Jobs.add_method(idx, "GetJobStatus", get_job_status, [job_id],
+                          [state, recipe,
+                           _argument("Submitted", ua.ObjectIds.DateTime, "UTC"),
+                           _argument("Started", ua.ObjectIds.DateTime, "UTC, 1601-01-01 if not started"),
+                           _argument("Finished", ua.ObjectIds.DateTime, "UTC, 1601-01-01 if not finished")])
+    await Jobs.add_method(idx, "ClaimJob", claim_job, [], [job_id, recipe])
+    await Jobs.add_method(idx, "CompleteJob", complete_job,
+                          [job_id, _argument("Succeeded", ua.ObjectIds.Boolean, "False if the slug failed")],
+                          [_argument("Completed", ua.ObjectIds.Boolean, "False if the job was not running")])
+    return queue, variables
@@ -0,0 +1,72 @@
+import gzip
+import asyncio
+from datetime import datetime, timedelta, timezone
+from asyncua import ua
+import historian
+from historian import Historian
+
+NODE = ua.NodeId(3, 2)
+T0 = datetime(2024, 1, 1, tzinfo = timezone.utc)
+
+
+async def record(store, n, spill_each = True):
+    #n changes of NODE one second apart, spilled one by one
+    await store.new_historized_node(NODE, None)
+    for i in range(n):
+        dv = ua.DataValue(ua.Variant(i, ua.VariantType.Int64), SourceTimestamp = T0 + timedelta(seconds = i))
+        await store.save_node_value(NODE, dv)
+        if spill_each:
+            await store.spill()
+
+def values(results):
+    return [dv.Value.Value for dv in results]
+
+def test_rotated_files_are_capped(tmp_path):
+    path = str(tmp_path / 'history.jsonl.gz')
+    store = Historian(capacity = 2, path = path, max_file_size = 1, max_files = 3)
+
+    async def run():
+        await record(store, 6)
+        return await store.read_range(NODE)
+    results = asyncio.run(run())
+    # every spill rotates, the three newest files and the ring buffer are left
+    assert [entry['file'] for entry in store.index['files']] == [str(tmp_path / f'history.{k:06d}.jsonl.gz') for k in (4, 5, 6)]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['history.000004.jsonl.gz', 'history.000005.jsonl.gz',
+                                                           'history.000006.jsonl.gz', 'history.jsonl.gz.index']
+    assert values(results) == [3, 4, 5]
+
+def test_read_opens_only_overlapping_files(tmp_path, monkeypatch):
+    path = str(tmp_path / 'history.jsonl.gz')
+    store = Historian(capacity = 1, path = path, max_file_size = 1)
+    asyncio.run(record(store, 5))
+    opened = []
+    open_file = gzip.open
+    def spy(name, mode = 'rb'):
+        opened.append(name)
+        return open_file(name, mode)
+    monkeypatch.setattr(historian.gzip, 'open', spy)
+    low, high = T0 + timedelta(seconds = 1), T0 + timedelta(seconds = 2)
+    results = asyncio.run(store.read_range(NODE, low, high))
+    assert values(results) == [1, 2]
+    assert opened == [str(tmp_path / 'history.000002.jsonl.gz'), str(tmp_path / 'history.000003.jsonl.gz')]
+
+def test_index_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'history.jsonl.gz')
+    asyncio.run(record(Historian(capacity = 1, path = path, max_file_size = 1), 3))
+    store = Historian(capacity = 1, path = path, max_file_size = 1)
+
+    async def run():
+        await store.new_historized_node(NODE, None)
+        return await store.read_range(NODE)
+    assert values(asyncio.run(run())) == [0, 1, 2]
+
+def test_history_file_without_index_is_read(tmp_path):
+    path = str(tmp_path / 'history.jsonl.gz')
+    asyncio.run(record(Historian(capacity = 1, path = path), 3))
+    (tmp_path / 'history.jsonl.gz.index').unlink()
+    store = Historian(capacity = 1, path = path)
+
+    async def run():
+        await store.new_historized_node(NODE, None)
+        return await store.read_range(NODE, T0 + timedelta(seconds = 1))
+    assert values(asyncio.run(run())) == [1, 2]
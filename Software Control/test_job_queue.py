@@ -0,0 +1,54 @@
+import pytest
+from job_queue import JobQueue, validate_recipe, QUEUED, RUNNING, DONE, FAILED, CANCELLED
+
+RECIPE = [120, 300, 7, 600, 3, 83, 1, 277]
+
+
+def test_validate_recipe():
+    assert validate_recipe([120.0, 300, 7, 600, 3, 83]) == [120, 300, 7, 600, 3, 83]
+    with pytest.raises(ValueError):
+        validate_recipe([120, 300, 7, 600, 3])
+    with pytest.raises(ValueError):
+        validate_recipe([120, 300, 7, 600, 3, -83])
+
+def test_jobs_are_claimed_in_submission_order():
+    queue = JobQueue()
+    first, second = queue.submit(RECIPE), queue.submit(RECIPE[:6])
+    assert (first.id, second.id, len(queue)) == (1, 2, 2)
+    job = queue.claim()
+    assert job is first and job.state == RUNNING and job.started is not None
+    assert queue.current is first and len(queue) == 1
+    assert queue.claim() is second
+    assert queue.claim() is None
+
+def test_complete_reports_running_jobs_only():
+    queue = JobQueue()
+    job = queue.submit(RECIPE)
+    assert not queue.complete(job.id)
+    queue.claim()
+    assert queue.complete(job.id)
+    assert job.state == DONE and job.finished is not None and queue.current is None
+    assert not queue.complete(job.id)
+    failed = queue.submit(RECIPE)
+    queue.claim()
+    queue.complete(failed.id, succeeded = False)
+    assert queue.status(failed.id).state == FAILED
+
+def test_cancel_only_queued_jobs():
+    queue = JobQueue()
+    running, queued = queue.submit(RECIPE), queue.submit(RECIPE)
+    queue.claim()
+    assert not queue.cancel(running.id)
+    assert queue.cancel(queued.id)
+    assert queued.state == CANCELLED and len(queue) == 0
+    assert not queue.cancel(queued.id)
+    assert not queue.cancel(99)
+
+def test_finished_jobs_are_forgotten_after_max_finished():
+    queue = JobQueue(max_finished = 2)
+    jobs = [queue.submit(RECIPE) for _ in range(3)]
+    for job in jobs:
+        queue.cancel(job.id)
+    assert queue.status(jobs[0].id) is None
+    assert [queue.status(job.id).state for job in jobs[1:]] == [CANCELLED, CANCELLED]
+    assert queue.submit(RECIPE).state == QUEUED